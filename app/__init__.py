@@ -1,22 +1,37 @@
-import sys
+import logging
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
+from app.core.cache import Cache
+from app.core.instrumentation import init_instrumentation
+from app.core.log import init_logging
+from app.core.metrics import init_metrics
+from app.core.profiling import init_profiling
+from app.core.json import FastJSONProvider
 from config import Config
 
 
 db = SQLAlchemy()
 migrate = Migrate()
 jwt = JWTManager()
+cache = Cache()
+
+logger = logging.getLogger(__name__)
 
 def create_app():
     app = Flask(__name__)
+    app.json = FastJSONProvider(app)
     app.config.from_object(Config)
+    init_logging(app)
 
     db.init_app(app)
     migrate.init_app(app, db)
     jwt.init_app(app)
+    cache.init_app(app)
+    init_instrumentation(app)
+    init_metrics(app)
+    init_profiling(app)
 
     from app.models import models  
     from app.routes.auth import auth_bp
@@ -31,10 +46,19 @@ def create_app():
     app.register_blueprint(cart_bp, url_prefix="/cart")
     app.register_blueprint(order_bp, url_prefix="/orders")
 
+    from app.cli import register_commands
+    register_commands(app)
+
+    from app.services.suggest_service import init_suggestions
+    init_suggestions(app)
+
+    from app.services.reservation_service import init_reservations
+    init_reservations(app)
+
     
     @app.errorhandler(422)
     def handle_422(err):
-        print("🔥 422 ERROR:", err, file=sys.stderr, flush=True)
+        logger.warning("Unprocessable request: %s", err)
         return {"msg": "Unprocessable Entity", "error": str(err)}, 422
 
 
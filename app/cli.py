@@ -0,0 +1,44 @@
+import click
+from flask.cli import with_appcontext
+from app.services.import_service import IMPORT_FORMATS, detect_format, import_products, iter_rows
+from app.services.reservation_service import sweep_expired
+
+
+@click.command("import-products")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--seller-id", type=int, required=True, help="User the imported products belong to.")
+@click.option("--format", "fmt", type=click.Choice(IMPORT_FORMATS), help="Defaults to the file extension.")
+@click.option("--batch-size", type=int, help="Rows per INSERT/commit, defaults to IMPORT_BATCH_SIZE.")
+@with_appcontext
+def import_products_command(path, seller_id, fmt, batch_size):
+    """Load products from a CSV (with a header row) or NDJSON file."""
+    fmt = fmt or detect_format(path)
+    if fmt is None:
+        raise click.UsageError("Cannot tell the format from the file name, pass --format")
+
+    def progress(report):
+        click.echo(f"{report['rows']:>10,} rows read, {report['imported']:,} imported, {report['errors']:,} errors")
+
+    with open(path, encoding="utf-8", newline="") as stream:
+        try:
+            report = import_products(
+                iter_rows(stream, fmt), seller_id, batch_size, progress
+            )
+        except ValueError as e:
+            raise click.ClickException(str(e))
+
+    for detail in report["error_details"]:
+        click.echo(f"line {detail['line']}: {detail['errors']}", err=True)
+    click.echo(f"Done: {report['imported']:,} of {report['rows']:,} rows imported, {report['errors']:,} errors")
+
+
+@click.command("release-reservations")
+@with_appcontext
+def release_reservations_command():
+    """Hand the stock of expired cart reservations back."""
+    click.echo(f"Released {sweep_expired():,} expired reservations")
+
+
+def register_commands(app):
+    app.cli.add_command(import_products_command)
+    app.cli.add_command(release_reservations_command)
@@ -0,0 +1,334 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Protocol
+from app.core.json import decode, encode
+
+
+class TTLCache:
+    """Bounded LRU cache whose entries also expire after ``ttl`` seconds."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = self.expirations = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+class CacheBackend(Protocol):
+    """Byte-oriented key/value store the ``Cache`` extension talks to.
+
+    The method set mirrors the subset of Redis commands we need (GET, SET EX,
+    DEL, INCR, FLUSHDB), so a networked server can be dropped in.
+    """
+
+    def get(self, key: str) -> Optional[bytes]: ...
+
+    def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None: ...
+
+    def delete(self, *keys: str) -> None: ...
+
+    def incr(self, key: str) -> int: ...
+
+    def get_counter(self, key: str) -> int: ...
+
+    def clear(self) -> None: ...
+
+    def stats(self) -> dict: ...
+
+
+class MemoryBackend:
+    """Process-local backend; every worker has its own copy."""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def set(self, key, value, ttl=None):
+        self._entries.set(key, value, ttl)
+
+    def delete(self, *keys):
+        for key in keys:
+            self._entries.delete(key)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def get_counter(self, key):
+        return self._counters.get(key, 0)
+
+    def clear(self):
+        self._entries.clear()
+        with self._lock:
+            self._counters.clear()
+
+    def stats(self):
+        return {"backend": "memory", **self._entries.stats()}
+
+
+class SQLiteBackend:
+    """Backend stored in a SQLite file, shared by every process on the host.
+
+    Entries past ``maxsize`` are pruned oldest-expiry first. Counters live in
+    their own table and never expire, so generation numbers survive eviction.
+    """
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, maxsize=1024, ttl=60):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._local = threading.local()
+        self._sets = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                " key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_cache_entries_expires_at ON cache_entries (expires_at)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_counters (key TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+            )
+
+    def _connect(self):
+        # One connection per thread, reopened after a fork
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT value FROM cache_entries WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return row[0]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        conn = self._connect()
+        conn.execute(
+            "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at",
+            (key, value, expires_at),
+        )
+        self._sets += 1
+        if self._sets % self.PRUNE_EVERY == 0:
+            self._prune(conn)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM cache_entries WHERE expires_at <= ?", (time.time(),))
+        overflow = conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0] - self.maxsize
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache_entries WHERE key IN ("
+                " SELECT key FROM cache_entries ORDER BY expires_at LIMIT ?)",
+                (overflow,),
+            )
+            self.evictions += overflow
+
+    def delete(self, *keys):
+        if keys:
+            self._connect().executemany("DELETE FROM cache_entries WHERE key = ?", [(k,) for k in keys])
+
+    def incr(self, key):
+        return self._connect().execute(
+            "INSERT INTO cache_counters (key, value) VALUES (?, 1)"
+            " ON CONFLICT(key) DO UPDATE SET value = value + 1 RETURNING value",
+            (key,),
+        ).fetchone()[0]
+
+    def get_counter(self, key):
+        row = self._connect().execute("SELECT value FROM cache_counters WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def clear(self):
+        conn = self._connect()
+        conn.execute("DELETE FROM cache_entries")
+        conn.execute("DELETE FROM cache_counters")
+
+    def stats(self):
+        size = self._connect().execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+        return {
+            "backend": "sqlite",
+            "path": self.path,
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class RedisBackend:
+    """Backend for a Redis-compatible server. Requires the ``redis`` package."""
+
+    def __init__(self, url, ttl=60):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package") from e
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.client.get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=max(1, int(self.ttl if ttl is None else ttl)))
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*keys)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def get_counter(self, key):
+        value = self.client.get(key)
+        return int(value) if value is not None else 0
+
+    def clear(self):
+        self.client.flushdb()
+
+    def stats(self):
+        return {"backend": "redis", "size": self.client.dbsize(), "hits": self.hits, "misses": self.misses}
+
+
+def create_backend(config):
+    name = config.get("CACHE_BACKEND", "memory")
+    maxsize = config.get("CACHE_MAXSIZE", 1024)
+    ttl = config.get("CACHE_TTL", 60)
+
+    if name == "memory":
+        return MemoryBackend(maxsize=maxsize, ttl=ttl)
+    if name == "sqlite":
+        path = config.get("CACHE_URL") or os.path.join(tempfile.gettempdir(), "greenmarket-cache.sqlite3")
+        return SQLiteBackend(path, maxsize=maxsize, ttl=ttl)
+    if name == "redis":
+        return RedisBackend(config["CACHE_URL"], ttl=ttl)
+    raise ValueError(f"Unknown CACHE_BACKEND: {name!r}")
+
+
+class Cache:
+    """Flask extension storing JSON values in the configured backend.
+
+    Groups of keys (e.g. every product listing page) are invalidated together
+    by bumping a namespace generation that callers fold into their keys. The
+    generation lives in the backend, so with a shared backend a write in one
+    worker invalidates the others too.
+    """
+
+    def __init__(self, app=None):
+        self.backend = MemoryBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = create_backend(app.config)
+        app.extensions["cache"] = self
+
+    def get(self, key, default=None):
+        raw = self.backend.get(key)
+        if raw is None:
+            return default
+        return decode(raw)
+
+    def set(self, key, value, ttl=None):
+        self.backend.set(key, encode(value), ttl)
+
+    def delete(self, *keys):
+        self.backend.delete(*keys)
+
+    def generation(self, namespace):
+        return self.backend.get_counter(f"gen:{namespace}")
+
+    def bump(self, namespace):
+        return self.backend.incr(f"gen:{namespace}")
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self):
+        return self.backend.stats()
@@ -0,0 +1,21 @@
+import hashlib
+import json
+from flask import Response, jsonify, request
+
+
+def make_etag(*parts):
+    raw = json.dumps(parts, separators=(",", ":"), default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+
+def conditional_json(etag, build_payload):
+    """Answer 304 if the client already has ``etag``, else the JSON payload.
+
+    ``build_payload`` is only called when the body is actually needed.
+    """
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = jsonify(build_payload())
+    response.set_etag(etag)
+    return response
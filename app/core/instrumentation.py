@@ -0,0 +1,105 @@
+"""Per-request timings: SQL, JSON serialization and the handler as a whole.
+
+A sampled request (INSTRUMENTATION_SAMPLE_RATE) counts and times its
+queries through engine events and times JSON encoding, then reports it all
+in a ``Server-Timing`` header and one ``key=value`` log line. Requests that
+aren't sampled only pay for a ``random()`` call.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager
+from flask import current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+
+class RequestTimings:
+    __slots__ = ("started", "queries", "db", "serialize")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+
+    def as_dict(self, handler):
+        return {
+            "queries": self.queries,
+            "db_ms": round(self.db * 1000, 2),
+            "serialize_ms": round(self.serialize * 1000, 2),
+            "handler_ms": round(handler * 1000, 2),
+        }
+
+    def server_timing(self, handler):
+        return (
+            f'db;dur={self.db * 1000:.2f};desc="{self.queries} queries", '
+            f"serialize;dur={self.serialize * 1000:.2f}, "
+            f"handler;dur={handler * 1000:.2f}"
+        )
+
+
+def current_timings():
+    """The running request's timings, or None when it isn't sampled."""
+    return g.get("_timings") if has_app_context() else None
+
+
+@contextmanager
+def timed(field):
+    """Add the time spent in the block to ``field`` of the request's timings."""
+    timings = current_timings()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        setattr(timings, field, getattr(timings, field) + time.perf_counter() - started)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_timings() is not None:
+        conn.info.setdefault("_query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    timings = current_timings()
+    started = conn.info.get("_query_started")
+    if timings is not None and started:
+        timings.db += time.perf_counter() - started.pop()
+        timings.queries += 1
+
+
+def _start_request():
+    rate = current_app.config["INSTRUMENTATION_SAMPLE_RATE"]
+    if rate > 0 and random.random() < rate:
+        g._timings = RequestTimings()
+
+
+def _finish_request(response):
+    timings = g.pop("_timings", None)
+    if timings is None:
+        return response
+
+    handler = time.perf_counter() - timings.started
+    response.headers.add("Server-Timing", timings.server_timing(handler))
+    fields = {
+        "method": request.method,
+        "path": request.path,
+        "endpoint": request.endpoint,
+        "status": response.status_code,
+        **timings.as_dict(handler),
+    }
+    logger.info(" ".join(f"{key}={value}" for key, value in fields.items()), extra={"timing": fields})
+    return response
+
+
+def init_instrumentation(app):
+    if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
@@ -0,0 +1,60 @@
+import json
+from flask.json.provider import DefaultJSONProvider
+from app.core.instrumentation import timed
+
+try:
+    import orjson
+except ImportError:  # optional dependency, fall back to the stdlib
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that uses orjson when it is installed.
+
+    Output matches the stdlib provider (sorted keys, same ``default`` hook)
+    except that orjson writes datetimes as ISO 8601 instead of HTTP dates.
+    Calls passing extra ``json.dumps`` keyword arguments, and installs
+    without orjson, go through the stdlib.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def dumps_bytes(self, obj, indent=False):
+        if orjson is None:
+            separators = None if indent else (",", ":")
+            return super().dumps(obj, indent=2 if indent else None, separators=separators).encode()
+
+        option = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        with timed("serialize"):
+            body = self.dumps_bytes(obj, indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def encode(obj):
+    """Compact JSON bytes, for storing payloads outside of a response."""
+    if orjson is None:
+        return json.dumps(obj, separators=(",", ":")).encode()
+    return orjson.dumps(obj)
+
+
+def decode(raw):
+    if orjson is None:
+        return json.loads(raw)
+    return orjson.loads(raw)
@@ -0,0 +1,122 @@
+"""Queue-backed logging with JSON output and request-id correlation.
+
+Request threads only put records on an in-memory queue; a listener thread
+formats and writes them, so a slow stderr or log shipper never holds up a
+request. Every record carries the id of the request it was logged in,
+taken from an incoming ``X-Request-ID`` header or generated, and echoed
+back on the response.
+"""
+import atexit
+import logging
+import logging.handlers
+import queue
+import sys
+import traceback
+import uuid
+from datetime import datetime, timezone
+from app.core.json import encode
+from flask import g, has_request_context, request
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s"
+
+# Attributes every LogRecord has; anything else was passed in ``extra``
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener = None
+_handler = None
+
+
+class RequestIdFilter(logging.Filter):
+    def filter(self, record):
+        if not hasattr(record, "request_id"):
+            record.request_id = g.get("request_id", "-") if has_request_context() else "-"
+        return True
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line with the message, request id and extras."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "request_id": getattr(record, "request_id", "-"),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        if record.exc_info:
+            record.exc_text = record.exc_text or self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return encode(entry).decode()
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record):
+        # Resolve everything that can't cross threads here, but leave the
+        # formatting to the listener's handler
+        record = logging.makeLogRecord(vars(record))
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info)).rstrip()
+            record.exc_info = None
+        return record
+
+
+def _parse_levels(value):
+    """``"app.services=DEBUG,sqlalchemy.engine=INFO"`` as a dict."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in (value or "").split(","))):
+        name, _, level = item.partition("=")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def _start_request():
+    request_id = request.headers.get("X-Request-ID", "")
+    g.request_id = request_id if 0 < len(request_id) <= 128 else uuid.uuid4().hex
+
+
+def _finish_request(response):
+    if "request_id" in g:
+        response.headers["X-Request-ID"] = g.request_id
+    return response
+
+
+def stop_logging():
+    """Write out queued records and stop the listener thread."""
+    global _listener, _handler
+    if _listener is not None:
+        _listener.stop()
+        logging.getLogger().removeHandler(_handler)
+        _listener = _handler = None
+
+
+def init_logging(app):
+    """Route all logging through one queue; safe to call again for a new app."""
+    global _listener, _handler
+    stop_logging()
+
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JSONFormatter() if app.config["LOG_FORMAT"] == "json" else logging.Formatter(TEXT_FORMAT))
+
+    _handler = _QueueHandler(queue.SimpleQueue())
+    _handler.addFilter(RequestIdFilter())
+    _listener = logging.handlers.QueueListener(_handler.queue, output, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    root.addHandler(_handler)
+    root.setLevel(app.config["LOG_LEVEL"].upper())
+    for name, level in _parse_levels(app.config["LOG_LEVELS"]).items():
+        logging.getLogger(name).setLevel(level)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+
+atexit.register(stop_logging)
@@ -0,0 +1,239 @@
+"""Request counters and latency histograms in Prometheus text format.
+
+Each thread records into its own shard, so the request path never takes a
+lock; shards are only summed when ``/metrics`` is scraped. With several
+worker processes (gunicorn) set METRICS_MULTIPROC_DIR: every worker then
+writes its totals to ``metrics-<pid>.json`` there, at most every
+METRICS_FLUSH_INTERVAL seconds and whenever it serves a scrape, and a
+scrape adds up all the files. Counters of exited workers keep counting;
+their pool gauges are dropped.
+"""
+import glob
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from app.core.json import decode, encode
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+REQUESTS = "http_requests_total"
+DURATION = "http_request_duration_seconds"
+POOL_GAUGES = {
+    "db_pool_size": ("Connections the pool keeps open.", "size"),
+    "db_pool_checked_out": ("Connections in use.", "checkedout"),
+    "db_pool_checked_in": ("Idle connections in the pool.", "checkedin"),
+    "db_pool_overflow": ("Connections opened beyond the pool size.", "overflow"),
+}
+
+
+class _Shard:
+    __slots__ = ("requests", "durations")
+
+    def __init__(self):
+        self.requests = {}
+        # labels -> per-bucket counts (not cumulative), then +Inf, then the sum
+        self.durations = {}
+
+
+class Metrics:
+    def __init__(self, buckets, directory=None, flush_interval=5.0, gauges=None):
+        self.buckets = sorted(buckets)
+        self.gauges = gauges
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+        # Separate from _lock, which snapshot() takes while a flush holds this one
+        self._flush_lock = threading.Lock()
+        self._flushed_at = 0.0
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = _Shard()
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def observe(self, endpoint, method, status, seconds):
+        shard = self._shard()
+        labels = (endpoint, method, str(status))
+        shard.requests[labels] = shard.requests.get(labels, 0) + 1
+        counts = shard.durations.get(labels)
+        if counts is None:
+            counts = shard.durations[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        counts[bisect_left(self.buckets, seconds)] += 1
+        counts[-1] += seconds
+
+    def snapshot(self):
+        """This process's totals as plain lists, the same shape as the files."""
+        requests, durations = {}, {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            # Copies, since the owning thread keeps writing
+            for labels, value in list(shard.requests.items()):
+                requests[labels] = requests.get(labels, 0) + value
+            for labels, counts in list(shard.durations.items()):
+                _add(durations.setdefault(labels, [0] * (len(counts) - 1) + [0.0]), list(counts))
+        return {
+            "pid": os.getpid(),
+            "buckets": self.buckets,
+            "requests": [[list(labels), value] for labels, value in requests.items()],
+            "durations": [[list(labels), counts] for labels, counts in durations.items()],
+            "gauges": self.gauges() if self.gauges else {},
+        }
+
+    def flush(self):
+        if not self.directory:
+            return
+        with self._flush_lock:
+            self._write()
+
+    def _write(self):
+        path = os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+        tmp = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(encode(self.snapshot()))
+        os.replace(tmp, path)
+        self._flushed_at = time.monotonic()
+
+    def maybe_flush(self):
+        """Flush if the interval passed, unless another thread is already at it."""
+        if not self.directory or time.monotonic() - self._flushed_at < self.flush_interval:
+            return
+        if not self._flush_lock.acquire(blocking=False):
+            return
+        try:
+            if time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._write()
+        finally:
+            self._flush_lock.release()
+
+    def collect(self):
+        """Totals over every worker (or just this process) as one snapshot."""
+        if not self.directory:
+            return self.snapshot()
+
+        self.flush()
+        requests, durations, live_gauges = {}, {}, {}
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            try:
+                with open(path, "rb") as f:
+                    data = decode(f.read())
+            except (OSError, ValueError):
+                continue  # removed or replaced while listing
+            if data["buckets"] != self.buckets:
+                continue
+            for labels, value in data["requests"]:
+                requests[tuple(labels)] = requests.get(tuple(labels), 0) + value
+            for labels, counts in data["durations"]:
+                _add(durations.setdefault(tuple(labels), [0] * (len(counts) - 1) + [0.0]), counts)
+            if _alive(data["pid"]):
+                for name, value in data["gauges"].items():
+                    live_gauges[name] = live_gauges.get(name, 0) + value
+        return {
+            "buckets": self.buckets,
+            "requests": [[list(labels), value] for labels, value in requests.items()],
+            "durations": [[list(labels), counts] for labels, counts in durations.items()],
+            "gauges": live_gauges,
+        }
+
+    def render(self):
+        data = self.collect()
+        lines = [
+            f"# HELP {REQUESTS} Requests by endpoint, method and status.",
+            f"# TYPE {REQUESTS} counter",
+        ]
+        for labels, value in sorted(data["requests"]):
+            lines.append(f"{REQUESTS}{{{_labels(labels)}}} {value}")
+
+        lines += [
+            f"# HELP {DURATION} Request latency by endpoint, method and status.",
+            f"# TYPE {DURATION} histogram",
+        ]
+        bounds = [_number(b) for b in data["buckets"]] + ["+Inf"]
+        for labels, counts in sorted(data["durations"]):
+            label_text = _labels(labels)
+            cumulative = 0
+            for bound, count in zip(bounds, counts[:-1]):
+                cumulative += count
+                lines.append(f'{DURATION}_bucket{{{label_text},le="{bound}"}} {cumulative}')
+            lines.append(f"{DURATION}_sum{{{label_text}}} {counts[-1]!r}")
+            lines.append(f"{DURATION}_count{{{label_text}}} {cumulative}")
+
+        for name, (help_text, _) in POOL_GAUGES.items():
+            if name in data["gauges"]:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {data['gauges'][name]}"]
+        return "\n".join(lines) + "\n"
+
+
+def _add(into, counts):
+    for i, value in enumerate(counts):
+        into[i] += value
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(values):
+    return ",".join(f'{key}="{_escape(value)}"' for key, value in zip(("endpoint", "method", "status"), values))
+
+
+def pool_gauges(engine):
+    """Connection pool figures, for pools that keep them (QueuePool)."""
+    gauges = {}
+    for name, (_, method) in POOL_GAUGES.items():
+        read = getattr(engine.pool, method, None)
+        if callable(read):
+            gauges[name] = read()
+    return gauges
+
+
+def _start_request():
+    g._metrics_started = time.perf_counter()
+
+
+def _record_request(response):
+    started = g.pop("_metrics_started", None)
+    if started is not None:
+        metrics = current_app.extensions["metrics"]
+        metrics.observe(request.endpoint or "unmatched", request.method, response.status_code,
+                        time.perf_counter() - started)
+        try:
+            metrics.maybe_flush()
+        except OSError:
+            # Metrics must never fail the request they describe
+            logger.warning("Writing metrics to %s failed", metrics.directory, exc_info=True)
+    return response
+
+
+def init_metrics(app):
+    directory = app.config["METRICS_MULTIPROC_DIR"]
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    app.extensions["metrics"] = Metrics(
+        app.config["METRICS_BUCKETS"], directory, app.config["METRICS_FLUSH_INTERVAL"],
+        gauges=lambda: pool_gauges(current_app.extensions["sqlalchemy"].engine),
+    )
+    app.before_request(_start_request)
+    app.after_request(_record_request)
@@ -0,0 +1,146 @@
+"""Profiles of single requests, on demand or for 1 in N requests.
+
+An admin adds ``X-Profile: pstats|collapsed`` (or ``?_profile=``) to any
+request and gets the profile back instead of the response body: a
+cProfile dump for ``pstats``/snakeviz, or collapsed stacks from a sampling
+profiler for flamegraph tools. The response's own status is in
+``X-Profiled-Status``.
+
+With PROFILE_SAMPLE_EVERY = N, every Nth request in a process is profiled
+in PROFILE_FORMAT and written to PROFILE_DIR, which keeps the newest
+PROFILE_KEEP files.
+"""
+import cProfile
+import itertools
+import marshal
+import os
+import sys
+import threading
+from collections import Counter
+from datetime import datetime
+from app.core.authorization import role_required
+from flask import Response, abort, current_app, g, request
+from flask_jwt_extended import jwt_required
+
+PROFILE_FORMATS = {
+    "pstats": ("application/octet-stream", "prof"),
+    "collapsed": ("text/plain; charset=utf-8", "collapsed"),
+}
+
+
+class StackSampler:
+    """Samples one thread's stack every ``interval`` seconds from a helper thread."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.stacks = Counter()
+        self._target = threading.get_ident()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._target)
+            stack = []
+            while frame is not None:
+                stack.append(f"{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}")
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def stop(self):
+        """Collapsed stacks, one ``frame;frame;... count`` line per stack."""
+        self._stop.set()
+        self._thread.join()
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common()).encode()
+
+
+class _CProfiler:
+    def __init__(self):
+        self._profile = cProfile.Profile()
+
+    def start(self):
+        self._profile.enable()
+        return self
+
+    def stop(self):
+        self._profile.disable()
+        self._profile.create_stats()
+        # Same bytes as Profile.dump_stats writes
+        return marshal.dumps(self._profile.stats)
+
+
+def _start(fmt):
+    if fmt == "collapsed":
+        return StackSampler(current_app.config["PROFILE_SAMPLE_INTERVAL"]).start()
+    try:
+        return _CProfiler().start()
+    except ValueError:
+        return None  # another profiler already runs in this process (Python 3.12+)
+
+
+@jwt_required()
+@role_required("admin")
+def _admin_only():
+    return None
+
+
+def _store(data, fmt):
+    directory = current_app.config["PROFILE_DIR"]
+    os.makedirs(directory, exist_ok=True)
+    name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.endpoint or 'unmatched'}-{os.getpid()}"
+    with open(os.path.join(directory, f"{name}.{PROFILE_FORMATS[fmt][1]}"), "wb") as f:
+        f.write(data)
+
+    # Names start with the time, so sorting them sorts by age
+    files = sorted(name for name in os.listdir(directory) if name.endswith((".prof", ".collapsed")))
+    for old in files[:-current_app.config["PROFILE_KEEP"]]:
+        try:
+            os.remove(os.path.join(directory, old))
+        except FileNotFoundError:
+            pass  # another worker rotated it first
+
+
+def _start_request():
+    fmt = request.headers.get("X-Profile") or request.args.get("_profile")
+    if fmt:
+        if fmt not in PROFILE_FORMATS:
+            abort(400, f"Profile format must be one of {', '.join(PROFILE_FORMATS)}")
+        denied = _admin_only()
+        if denied is not None:
+            return denied
+        g._profile = (fmt, _start(fmt), True)
+        return None
+
+    every = current_app.config["PROFILE_SAMPLE_EVERY"]
+    if every and next(current_app.extensions["profiling"]) % every == 0:
+        fmt = current_app.config["PROFILE_FORMAT"]
+        g._profile = (fmt, _start(fmt), False)
+    return None
+
+
+def _finish_request(response):
+    fmt, profiler, on_demand = g.pop("_profile", (None, None, False))
+    if profiler is None:
+        return response
+
+    data = profiler.stop()
+    if not on_demand:
+        _store(data, fmt)
+        return response
+
+    mimetype, extension = PROFILE_FORMATS[fmt]
+    return Response(data, content_type=mimetype, headers={
+        "X-Profiled-Status": str(response.status_code),
+        "Content-Disposition": f"attachment; filename={request.endpoint or 'unmatched'}.{extension}",
+    })
+
+
+def init_profiling(app):
+    app.extensions["profiling"] = itertools.count(1)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
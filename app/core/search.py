@@ -0,0 +1,83 @@
+import math
+import re
+import threading
+from collections import Counter
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower()) if text else []
+
+
+class InvertedIndex:
+    """In-memory inverted index with BM25 ranking.
+
+    Documents are added, replaced and removed one at a time, so the index can
+    be kept in sync with individual writes instead of being rebuilt.
+    """
+
+    k1 = 1.2
+    b = 0.75
+
+    def __init__(self):
+        self._postings = {}  # term -> {doc_id: term frequency}
+        self._doc_terms = {}  # doc_id -> {term: term frequency}
+        self._doc_lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, doc_id, text):
+        terms = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            self._doc_terms[doc_id] = terms
+            self._doc_lengths[doc_id] = sum(terms.values())
+            self._total_length += self._doc_lengths[doc_id]
+            for term, tf in terms.items():
+                self._postings.setdefault(term, {})[doc_id] = tf
+
+    def remove(self, doc_id):
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        terms = self._doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in terms:
+            docs = self._postings[term]
+            del docs[doc_id]
+            if not docs:
+                del self._postings[term]
+
+    def search(self, query):
+        """Ids of documents containing every query term, best BM25 score first.
+
+        Returns a list of ``(doc_id, score)``.
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            postings = [self._postings.get(term) for term in terms]
+            if not postings or not all(postings):
+                return []
+
+            # Intersect starting from the rarest term
+            postings.sort(key=len)
+            matches = set(postings[0]).intersection(*postings[1:])
+
+            n = len(self._doc_terms)
+            avg_length = self._total_length / n
+            scores = dict.fromkeys(matches, 0.0)
+            for docs in postings:
+                idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+                for doc_id in matches:
+                    tf = docs[doc_id]
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
@@ -0,0 +1,134 @@
+import heapq
+import threading
+from array import array
+from bisect import bisect_left
+
+
+def normalize(name):
+    return " ".join(name.casefold().split())
+
+
+class SuggestIndex:
+    """Prefix lookup over product names, best stocked first.
+
+    Names are kept as one sorted array with a parallel array of ids, so a
+    prefix is a contiguous range found with two bisects. Ranges up to
+    ``scan_limit`` entries are ranked on the fly; the few prefixes that match
+    more (one or two letters) have their top ``max_k`` memoized; those are
+    computed when the index is built and patched in place on writes.
+    """
+
+    def __init__(self, max_k=50, scan_limit=2000):
+        self.max_k = max_k
+        self.scan_limit = scan_limit
+        self._keys = []
+        self._ids = array("q")
+        self._names = {}  # id -> display name
+        self._stock = {}  # id -> stock
+        self._wide = {}  # prefix -> memoized top ids
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._names)
+
+    @classmethod
+    def build(cls, rows, **kwargs):
+        """Bulk load from ``(id, name, stock)`` rows with a single sort."""
+        index = cls(**kwargs)
+        entries = []
+        for product_id, name, stock in rows:
+            index._names[product_id] = name
+            index._stock[product_id] = stock
+            entries.append((normalize(name), product_id))
+        entries.sort()
+        index._keys = [key for key, _ in entries]
+        index._ids = array("q", (product_id for _, product_id in entries))
+        for prefix in {key[:length] for key, _ in entries for length in (1, 2)}:
+            index._top(prefix)
+        return index
+
+    def add(self, product_id, name, stock):
+        with self._lock:
+            old_key = self._remove_entry(product_id)
+            key = normalize(name)
+            position = bisect_left(self._keys, key)
+            # Equal names stay ordered by id
+            while position < len(self._keys) and self._keys[position] == key and self._ids[position] < product_id:
+                position += 1
+            self._keys.insert(position, key)
+            self._ids.insert(position, product_id)
+            self._names[product_id] = name
+            self._stock[product_id] = stock
+            self._patch_wide(product_id, old_key, key)
+
+    def remove(self, product_id):
+        with self._lock:
+            key = self._remove_entry(product_id)
+            if key is not None:
+                self._patch_wide(product_id, key, None)
+
+    def _remove_entry(self, product_id):
+        name = self._names.pop(product_id, None)
+        if name is None:
+            return None
+        del self._stock[product_id]
+        key = normalize(name)
+        position = bisect_left(self._keys, key)
+        while self._ids[position] != product_id:
+            position += 1
+        del self._keys[position]
+        del self._ids[position]
+        return key
+
+    def _rank(self, product_id):
+        return -self._stock[product_id], normalize(self._names[product_id]), product_id
+
+    def _patch_wide(self, product_id, old_key, new_key):
+        """Move ``product_id`` within the memoized top lists it affects.
+
+        A list that was full and loses an entry (or sees it drop to the end)
+        is discarded, since the candidate that should move up is unknown.
+        """
+        rank = self._rank(product_id) if new_key is not None else None
+        for prefix, top in list(self._wide.items()):
+            matches = new_key is not None and new_key.startswith(prefix)
+            full = len(top) == self.max_k
+            if old_key is not None and old_key.startswith(prefix) and product_id in top:
+                top.remove(product_id)
+            elif not matches or (full and rank > self._rank(top[-1])):
+                continue
+            else:
+                full = False
+
+            if matches:
+                position = bisect_left(top, rank, key=self._rank)
+                if full and position == len(top):
+                    del self._wide[prefix]
+                    continue
+                top.insert(position, product_id)
+                del top[self.max_k:]
+            elif full:
+                del self._wide[prefix]
+
+    def _top(self, prefix):
+        top = self._wide.get(prefix)
+        if top is None:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix + "\U0010ffff", lo)
+            ids, stock = self._ids, self._stock
+            # nlargest is stable, so equal stock keeps name order
+            top = heapq.nlargest(self.max_k, (ids[i] for i in range(lo, hi)), key=stock.__getitem__)
+            if hi - lo > self.scan_limit:
+                self._wide[prefix] = top
+        return top
+
+    def suggest(self, prefix, k=10):
+        """Up to ``k`` ``(id, name, stock)`` whose name starts with ``prefix``."""
+        prefix = normalize(prefix)
+        k = min(k, self.max_k)
+        with self._lock:
+            top = self._top(prefix)
+            return [(product_id, self._names[product_id], self._stock[product_id]) for product_id in top[:k]]
+
+    def stats(self):
+        return {"size": len(self._names), "memoized_prefixes": len(self._wide)}
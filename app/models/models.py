@@ -1,6 +1,15 @@
 from datetime import datetime
+from sqlalchemy import func, literal_column
 from app import db
 
+
+def _search_document(name, description):
+    # Literals are inlined rather than bound so queries render the same
+    # expression as the index definition
+    space, empty = literal_column("' '"), literal_column("''")
+    return func.to_tsvector(literal_column("'english'"), name + space + func.coalesce(description, empty))
+
+
 class User(db.Model):
     __tablename__ = "users"
 
@@ -29,9 +38,26 @@ class Product(db.Model):
     image_url = db.Column(db.String(255))
     seller_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, server_default="1")  # bumped on every update, used for ETags
+    # >0 keeps the stock in that many ProductStockShard rows; `stock` is then a rolled-up total
+    stock_shards = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     seller = db.relationship("User", back_populates="products")
 
+    __table_args__ = (
+        db.Index("ix_products_seller_id_price", seller_id, price),
+        db.Index("ix_products_price_id", price, id),
+        db.Index("ix_products_stock", stock),
+        db.Index(
+            "ix_products_search", _search_document(name, description), postgresql_using="gin"
+        ).ddl_if(dialect="postgresql"),
+    )
+
+
+# Document matched by product search on Postgres; must stay identical to the
+# ix_products_search expression for the index to be used.
+product_search_document = _search_document(Product.name, Product.description)
+
 
 class CartItem(db.Model):
     __tablename__ = "cart_items"
@@ -44,6 +70,10 @@ class CartItem(db.Model):
     user = db.relationship("User", back_populates="cart_items")
     product = db.relationship("Product")
 
+    __table_args__ = (
+        db.Index("ux_cart_items_user_id_product_id", user_id, product_id, unique=True),
+    )
+
 
 class Order(db.Model):
     __tablename__ = "orders"
@@ -53,10 +83,15 @@ class Order(db.Model):
     total_amount = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(50), default="pending")  # pending, paid, shipped, etc.
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    version = db.Column(db.Integer, nullable=False, server_default="1")  # bumped on every update, used for ETags
 
     user = db.relationship("User", back_populates="orders")
     order_items = db.relationship("OrderItem", back_populates="order", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        db.Index("ix_orders_user_id_created_at", user_id, created_at.desc()),
+    )
+
 
 class OrderItem(db.Model):
     __tablename__ = "order_items"
@@ -70,6 +105,10 @@ class OrderItem(db.Model):
     order = db.relationship("Order", back_populates="order_items")
     product = db.relationship("Product")
 
+    __table_args__ = (
+        db.Index("ix_order_items_order_id", order_id),
+    )
+
     
 class Transaction(db.Model):
     __tablename__ = "transactions"
@@ -81,5 +120,56 @@ class Transaction(db.Model):
     status = db.Column(db.String(50), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    order = db.relationship("Order", backref="transactions", uselist=False)   
+    order = db.relationship("Order", backref="transactions", uselist=False)
+
+    __table_args__ = (
+        db.Index("ix_transactions_order_id", order_id),
+    )
+
+
+
+class IdempotencyKey(db.Model):
+    __tablename__ = "idempotency_keys"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+    request_hash = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default="in_progress")  # in_progress, completed
+    response_code = db.Column(db.Integer)
+    response_body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index("ux_idempotency_keys_user_id_key", user_id, key, unique=True),
+        db.Index("ix_idempotency_keys_expires_at", expires_at),
+    )
+
+
+# One bucket of a sharded product's stock, see app/services/stock_service.py
+class ProductStockShard(db.Model):
+    __tablename__ = "product_stock_shards"
+
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    shard = db.Column(db.Integer, primary_key=True)
+    stock = db.Column(db.Integer, nullable=False)
+
+
+# Stock held for a cart line. While the row exists its quantity is already
+# taken out of Product.stock; deleting it hands the stock back (release,
+# expiry) or turns it into a sale (checkout).
+class StockReservation(db.Model):
+    __tablename__ = "stock_reservations"
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("users.id"), nullable=False)
+    product_id = db.Column(db.Integer, db.ForeignKey("products.id"), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
 
+    __table_args__ = (
+        db.Index("ux_stock_reservations_user_id_product_id", user_id, product_id, unique=True),
+        db.Index("ix_stock_reservations_expires_at", expires_at),
+    )
@@ -0,0 +1,91 @@
+from app.models.models import CartItem, Order, OrderItem, Product, StockReservation
+from sqlalchemy import func
+
+
+def _isoformat(value):
+    return value.isoformat() if value is not None else None
+
+
+def _public_stock(value):
+    # Rows written before holds were subtracted on restock can be negative
+    return max(value, 0)
+
+
+class RowSerializer:
+    """Precompiled row -> dict converter for a fixed set of columns.
+
+    ``fields`` is a list of ``(key, column)`` or ``(key, column, convert)``.
+    Select ``serializer.columns`` and pass the result rows to ``many``; the
+    per-row function is generated once so serializing is a single dict
+    literal per row with no attribute lookups. ``from_object`` does the same
+    for ORM instances.
+    """
+
+    def __init__(self, fields):
+        self.keys = [field[0] for field in fields]
+        self.columns = [field[1] for field in fields]
+
+        namespace = {}
+        by_index, by_attr = [], []
+        for i, field in enumerate(fields):
+            key, column = field[0], field[1]
+            if len(field) > 2:
+                namespace[f"convert_{i}"] = field[2]
+                by_index.append(f"{key!r}: convert_{i}(row[{i}])")
+                by_attr.append(f"{key!r}: convert_{i}(obj.{column.key})")
+            else:
+                by_index.append(f"{key!r}: row[{i}]")
+                by_attr.append(f"{key!r}: obj.{column.key}")
+
+        source = (
+            f"def from_row(row):\n    return {{{', '.join(by_index)}}}\n"
+            f"def from_object(obj):\n    return {{{', '.join(by_attr)}}}\n"
+        )
+        exec(compile(source, f"<serializer {', '.join(self.keys)}>", "exec"), namespace)
+        self.from_row = namespace["from_row"]
+        self.from_object = namespace["from_object"]
+
+    def many(self, rows):
+        from_row = self.from_row
+        return [from_row(row) for row in rows]
+
+
+product_serializer = RowSerializer([
+    ("id", Product.id),
+    ("name", Product.name),
+    ("price", Product.price),
+    ("stock", Product.stock, _public_stock),
+    ("seller_id", Product.seller_id),
+])
+
+cart_item_serializer = RowSerializer([
+    ("id", CartItem.id),
+    ("product_id", CartItem.product_id),
+    ("quantity", CartItem.quantity),
+])
+
+# GET /cart/?expand=product: one row per cart line joined with its product and
+# the user's hold on it, which is already out of Product.stock
+cart_line_serializer = RowSerializer([
+    ("id", CartItem.id),
+    ("product_id", CartItem.product_id),
+    ("quantity", CartItem.quantity),
+    ("name", Product.name),
+    ("price", Product.price),
+    ("stock", Product.stock, _public_stock),
+    ("available", (Product.stock + func.coalesce(StockReservation.quantity, 0) >= CartItem.quantity).label("available"), bool),
+    ("line_total", (Product.price * CartItem.quantity).label("line_total")),
+])
+
+order_serializer = RowSerializer([
+    ("id", Order.id),
+    ("total_amount", Order.total_amount),
+    ("status", Order.status),
+    ("created_at", Order.created_at, _isoformat),
+])
+
+order_item_serializer = RowSerializer([
+    ("product_id", OrderItem.product_id),
+    ("quantity", OrderItem.quantity),
+    ("unit_price", OrderItem.unit_price),
+])
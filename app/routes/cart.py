@@ -1,26 +1,29 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required
-from app.services.cart_service import add_to_cart, get_cart_items, remove_from_cart
+from app.models.serializers import cart_item_serializer
+from app.services.cart_service import add_to_cart, get_cart_items, get_cart_lines, remove_from_cart
 
 cart_bp = Blueprint("cart", __name__)
 
 @cart_bp.route("/", methods=["POST"])
 @jwt_required()
 def add():
-    item = add_to_cart(request.get_json())
-    return jsonify({"msg": "Item added to cart", "item_id": item.id}), 201
+    data = request.get_json()
+    rows = add_to_cart(data)
+    if isinstance(data, list):
+        items = [{"item_id": row[0], "product_id": row[1], "quantity": row[2]} for row in rows]
+        return jsonify({"msg": "Items added to cart", "items": items}), 201
+    return jsonify({"msg": "Item added to cart", "item_id": rows[0][0]}), 201
 
 @cart_bp.route("/", methods=["GET"])
 @jwt_required()
 def get():
-    cart = get_cart_items()
-    return jsonify([
-        {
-            "id": item.id,
-            "product_id": item.product_id,
-            "quantity": item.quantity
-        } for item in cart
-    ])
+    expand = request.args.get("expand")
+    if expand == "product":
+        return jsonify(get_cart_lines())
+    if expand:
+        return jsonify({"msg": "expand only supports 'product'"}), 400
+    return jsonify(cart_item_serializer.many(get_cart_items()))
 
 @cart_bp.route("/<int:item_id>/", methods=["DELETE"])
 @jwt_required()
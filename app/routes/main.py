@@ -1,8 +1,24 @@
 # app/routes/main.py
-from flask import Blueprint
+from flask import Blueprint, Response, current_app, jsonify
+from flask_jwt_extended import jwt_required
+from app import cache
+from app.core.authorization import role_required
 
 main_bp = Blueprint("main", __name__)
 
 @main_bp.route("/")
 def index():
     return "Welcome to the Sustainable Shopping API!"
+
+
+@main_bp.route("/cache/stats")
+@jwt_required()
+@role_required("admin")
+def cache_stats():
+    return jsonify(cache.stats())
+
+
+@main_bp.route("/metrics")
+def metrics():
+    body = current_app.extensions["metrics"].render()
+    return Response(body, content_type="text/plain; version=0.0.4; charset=utf-8")
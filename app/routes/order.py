@@ -1,76 +1,85 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.services.order_service import checkout, get_user_orders, get_order_with_items, update_order_status
+import logging
+from datetime import date
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt, get_jwt_identity
+from app.services.order_service import (
+    EXPORT_FORMATS, checkout, get_order_history, get_order_history_etag, get_order_payload, iter_order_export,
+    parse_since, update_order_status
+)
+from app.core.etag import conditional_json
+from app.services.idempotency_service import run_idempotent
 from app.core.authorization import role_required
 
 order_bp = Blueprint("orders", __name__)
+logger = logging.getLogger(__name__)
 
 @order_bp.route("/checkout", methods=["POST"])
 @jwt_required()
 def create_order():
-    print("🛬 /orders/checkout was reached")
     user_id = get_jwt_identity()
     data = request.get_json() or {}
+    logger.debug("Checkout requested", extra={"user_id": int(user_id), "payment_method": data.get("payment_method")})
 
-    print("✅ JWT received, user_id =", user_id)
-    print("Received Payment Method:", data.get("payment_method"))
+    def run_checkout():
+        order, error = checkout(user_id, data)
+        if error:
+            logger.info("Checkout rejected: %s", error, extra={"user_id": int(user_id)})
+            return {"msg": error}, 400
+        return {"msg": "Checkout successful", "order_id": order.id}, 201
 
-    order, error = checkout(user_id, data)
-    if error:
-        print("❌ Checkout error:", error)
-        return jsonify({"msg": error}), 400
+    key = request.headers.get("Idempotency-Key")
+    if not key:
+        body, status = run_checkout()
+        return jsonify(body), status
+
+    if len(key) > 255:
+        return jsonify({"msg": "Idempotency-Key must be at most 255 characters"}), 400
 
-    print("✅ Order created: ID =", order.id)
-    return jsonify({"msg": "Checkout successful", "order_id": order.id}), 201
+    body, status, replayed = run_idempotent(int(user_id), key, data, run_checkout)
+    response = jsonify(body)
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return response, status
 
 
 @order_bp.route("/me", methods=["GET"])
 @jwt_required()
 def get_user_order_list():
     user_id = get_jwt_identity()
-    orders = get_user_orders(user_id)
-
-    result = []
-    for order in orders:
-        result.append({
-            "id": order.id,
-            "total_amount": order.total_amount,
-            "status": order.status,
-            "created_at": order.created_at.isoformat(),
-            "items": [
-                {
-                    "product_id": item.product_id,
-                    "quantity": item.quantity,
-                    "unit_price": item.unit_price
-                } for item in order.order_items
-            ]
-        })
-
-    return jsonify(result), 200
+    etag = get_order_history_etag(user_id)
+    return conditional_json(etag, lambda: get_order_history(user_id))
+
+
+@order_bp.route("/export", methods=["GET"])
+@jwt_required()
+@role_required("admin", "seller")
+def export_orders():
+    fmt = request.args.get("format", "csv")
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"msg": "format must be csv or ndjson"}), 400
+    since = parse_since(request.args.get("since"))
+
+    chunks = iter_order_export(get_jwt_identity(), get_jwt().get("role"), since, fmt)
+    response = Response(
+        stream_with_context(chunks),
+        mimetype="text/csv" if fmt == "csv" else "application/x-ndjson",
+    )
+    response.headers["Content-Disposition"] = f"attachment; filename=orders-{date.today().isoformat()}.{fmt}"
+    # Don't let a proxy hold the stream back until it is complete
+    response.headers["X-Accel-Buffering"] = "no"
+    return response
 
 
 @order_bp.route("/<int:order_id>", methods=["GET"])
 @jwt_required()
 def get_order_detail(order_id):
     user_id = get_jwt_identity()
-    order, error = get_order_with_items(user_id, order_id)
+    order, error = get_order_payload(user_id, order_id)
 
     if error:
         return jsonify({"msg": error}), 404
 
-    return jsonify({
-        "id": order.id,
-        "total_amount": order.total_amount,
-        "status": order.status,
-        "created_at": order.created_at.isoformat(),
-        "items": [
-            {
-                "product_id": item.product_id,
-                "quantity": item.quantity,
-                "unit_price": item.unit_price
-            } for item in order.order_items
-        ]
-    }), 200
+    return jsonify(order), 200
 
 
 @order_bp.route("/<int:order_id>", methods=["PATCH"])
@@ -1,9 +1,13 @@
-from flask import Blueprint, jsonify, request
-from flask_jwt_extended import jwt_required
+from flask import Blueprint, abort, jsonify, request
+from flask_jwt_extended import get_jwt, get_jwt_identity, jwt_required
+from app.core.etag import conditional_json
 from app.services.product_services import (
-    create_product, get_all_products, get_product_by_id,
-    update_product, delete_product
+    bulk_create_products, bulk_delete_products, bulk_update_products,
+    create_product, get_product_listing, get_product_listing_etag, get_product_detail, get_product_etag, update_product, delete_product
 )
+from app.services.import_service import IMPORT_FORMATS, detect_format, import_products, iter_rows
+from app.services.search_service import search_products
+from app.services.suggest_service import suggest_products
 
 product_bp = Blueprint("products", __name__)
 
@@ -13,29 +17,84 @@ def create():
     product = create_product(request.get_json())
     return jsonify({"msg": "Product created", "id": product.id}), 201
 
+def _bulk_response(results, errors, status):
+    if errors:
+        return jsonify({"msg": "Validation failed, nothing was written", "errors": errors}), 400
+    return jsonify({"count": len(results), "results": results}), status
+
+
+@product_bp.route("/bulk", methods=["POST"])
+@jwt_required()
+def bulk_create():
+    results, errors = bulk_create_products(request.get_json())
+    return _bulk_response(results, errors, 201)
+
+
+@product_bp.route("/bulk", methods=["PATCH"])
+@jwt_required()
+def bulk_update():
+    results, errors = bulk_update_products(request.get_json())
+    return _bulk_response(results, errors, 200)
+
+
+@product_bp.route("/bulk", methods=["DELETE"])
+@jwt_required()
+def bulk_delete():
+    data = request.get_json()
+    results, errors = bulk_delete_products(data.get("ids") if isinstance(data, dict) else None)
+    return _bulk_response(results, errors, 200)
+
+
+@product_bp.route("/import", methods=["POST"])
+@jwt_required()
+def import_feed():
+    if get_jwt()["role"] not in ["admin", "seller"]:
+        abort(403, "Only admin or seller can import products")
+
+    # Either a multipart upload in "file" or the raw feed as the request body
+    upload = request.files.get("file")
+    fmt = request.args.get("format") or detect_format(upload.filename if upload else None)
+    if fmt is None and request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        fmt = "ndjson"
+    elif fmt is None and request.mimetype == "text/csv":
+        fmt = "csv"
+    if fmt not in IMPORT_FORMATS:
+        abort(400, "Pass format=csv or format=ndjson")
+
+    stream = upload.stream if upload else request.stream
+    batch_size = request.args.get("batch_size", type=int)
+    report = import_products(iter_rows(stream, fmt), int(get_jwt_identity()), batch_size)
+    return jsonify(report), 200
+
+
 @product_bp.route("/", methods=["GET"])
 def list_products():
     filters = request.args
-    products = get_all_products(filters)
-    return jsonify([{
-        "id": p.id,
-        "name": p.name,
-        "price": p.price,
-        "stock": p.stock,
-        "seller_id": p.seller_id
-    } for p in products])
+    etag = get_product_listing_etag(filters)
+    return conditional_json(etag, lambda: get_product_listing(filters))
+
+
+@product_bp.route("/search", methods=["GET"])
+def search():
+    query = request.args.get("q", "").strip()
+    if not query:
+        abort(400, "Missing search query 'q'")
+    return jsonify(search_products(query, request.args))
+
+
+@product_bp.route("/suggest", methods=["GET"])
+def suggest():
+    prefix = request.args.get("prefix", "").strip()
+    if not prefix:
+        abort(400, "Missing 'prefix'")
+    k = request.args.get("limit", 10, type=int)
+    return jsonify(suggest_products(prefix, max(k, 1)))
 
 
 @product_bp.route("/<int:product_id>", methods=["GET"])
 def detail(product_id):
-    p = get_product_by_id(product_id)
-    return jsonify({
-        "id": p.id,
-        "name": p.name,
-        "price": p.price,
-        "stock": p.stock,
-        "seller_id": p.seller_id
-    })
+    etag = get_product_etag(product_id)
+    return conditional_json(etag, lambda: get_product_detail(product_id))
 
 @product_bp.route("/<int:product_id>", methods=["PUT"])
 @jwt_required()
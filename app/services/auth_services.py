@@ -3,8 +3,13 @@ from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token, get_jwt_identity, get_jwt
 from datetime import timedelta
+import logging
 import re
 
+logger = logging.getLogger(__name__)
+# Mock mail contents, live tokens included; enable with LOG_LEVELS=app.mail=DEBUG
+mail_logger = logging.getLogger("app.mail")
+
 # Validate password strength
 def is_strong_password(password):
     return (
@@ -40,16 +45,11 @@ def verify_user_email():
     return {"msg": "Email verified successfully"}, 200
 
 
-# Mock email sender (prints to terminal)
+# Mock email sender; the link itself only goes to the DEBUG-level mail logger
 def send_verification_email(user, token):
     verify_url = f"http://localhost:5000/verify-email?token={token}"
-    print("=" * 60)
-    print(f"🔐 MOCK EMAIL to: {user.email}")
-    print(f"Hello {user.full_name},")
-    print("Please verify your email by clicking the link below:")
-    print(f"{verify_url}")
-    print("This link expires in 1 hour.")
-    print("=" * 60)
+    logger.info("Mock verification email sent to user %s, link expires in 1 hour", user.id)
+    mail_logger.debug("Verification link for %s: %s", user.email, verify_url)
 
 # Main register function
 def register_user(data):
@@ -1,30 +1,147 @@
 from app import db
-from app.models.models import CartItem, Product
-from flask import abort
+from app.models.models import CartItem, Product, StockReservation
+from app.models.serializers import cart_item_serializer, cart_line_serializer
+from app.services.reservation_service import release, release_expired, reservations_enabled, reserve, stock_changed
+from flask import abort, current_app
 from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import case, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+def _cart_lines(data):
+    """Merge a single line or an array of lines into ``{product_id: quantity}``."""
+    lines = data if isinstance(data, list) else [data]
+    max_items = current_app.config["CART_MAX_BATCH_ITEMS"]
+    if not lines or len(lines) > max_items:
+        abort(400, f"Expected 1 to {max_items} cart lines")
+
+    quantities = {}
+    for line in lines:
+        if not isinstance(line, dict):
+            abort(400, "Each cart line must be an object")
+        product_id = line.get("product_id")
+        quantity = line.get("quantity", 1)
+        if not isinstance(product_id, int) or isinstance(product_id, bool):
+            abort(400, "Invalid product_id")
+        if not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+            abort(400, "Invalid quantity")
+        quantities[product_id] = quantities.get(product_id, 0) + quantity
+    return quantities
+
+
+def _insert_for_dialect():
+    name = db.engine.dialect.name
+    if name == "postgresql":
+        return postgresql.insert
+    if name == "sqlite":
+        return sqlite.insert
+    return None
+
 
 def add_to_cart(data):
+    """Add one line (an object) or many (an array) to the user's cart.
+
+    Lines for a product already in the cart increase its quantity. On
+    Postgres and SQLite this is a single INSERT ... SELECT ... ON CONFLICT
+    DO UPDATE, so concurrent adds can't create duplicate lines, and
+    unknown products are detected from the rows it returns. With
+    STOCK_RESERVATIONS on, the added quantities are also held in the same
+    transaction. Returns the resulting ``(id, product_id, quantity)`` rows
+    in request order.
+    """
     user_id = int(get_jwt_identity())
-    product_id = data.get("product_id")
-    quantity = data.get("quantity", 1)
+    quantities = _cart_lines(data)
+
+    dialect_insert = _insert_for_dialect()
+    if dialect_insert is None:
+        return _add_to_cart_fallback(user_id, quantities)
+
+    cart_items = CartItem.__table__
+    stmt = dialect_insert(cart_items).from_select(
+        ["user_id", "product_id", "quantity"],
+        select(literal(user_id), Product.id, case(quantities, value=Product.id))
+        .where(Product.id.in_(quantities)),
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[cart_items.c.user_id, cart_items.c.product_id],
+        set_={"quantity": cart_items.c.quantity + stmt.excluded.quantity},
+    ).returning(cart_items.c.id, cart_items.c.product_id, cart_items.c.quantity)
 
-    product = db.session.get(Product, product_id)
-    if not product:
+    # A second attempt only follows handing back expired holds on these products
+    for attempt in range(2):
+        try:
+            rows = {row.product_id: row for row in db.session.execute(stmt)}
+            if len(rows) != len(quantities):
+                db.session.rollback()
+                abort(404, "Product not found")
+            if not reservations_enabled():
+                db.session.commit()
+                return [rows[product_id] for product_id in quantities]
+            if reserve(user_id, quantities):
+                db.session.commit()
+                stock_changed(*quantities)
+                return [rows[product_id] for product_id in quantities]
+            db.session.rollback()
+        except SQLAlchemyError:
+            db.session.rollback()
+            raise
+
+        if attempt or not release_expired(product_ids=list(quantities)):
+            abort(409, "Not enough stock to reserve")
+
+
+def _add_to_cart_fallback(user_id, quantities):
+    # Read-then-write for databases without ON CONFLICT; relies on the
+    # unique (user_id, product_id) index to reject duplicate lines. Stock
+    # reservations need ON CONFLICT too, so init_reservations refuses to
+    # start with them on such a database and nothing is held here
+    products = db.session.execute(select(Product.id).where(Product.id.in_(quantities))).scalars().all()
+    if len(products) != len(quantities):
         abort(404, "Product not found")
 
-    item = CartItem.query.filter_by(user_id=user_id, product_id=product_id).first()
-    if item:
-        item.quantity += quantity
-    else:
-        item = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
-        db.session.add(item)
+    items = {
+        item.product_id: item for item in
+        CartItem.query.filter(CartItem.user_id == user_id, CartItem.product_id.in_(quantities))
+    }
+    for product_id, quantity in quantities.items():
+        if product_id in items:
+            items[product_id].quantity += quantity
+        else:
+            items[product_id] = CartItem(user_id=user_id, product_id=product_id, quantity=quantity)
+            db.session.add(items[product_id])
 
     db.session.commit()
-    return item
+    return [(items[pid].id, pid, items[pid].quantity) for pid in quantities]
 
 def get_cart_items():
     user_id = int(get_jwt_identity())
-    return CartItem.query.filter_by(user_id=user_id).all()
+    return db.session.execute(
+        select(*cart_item_serializer.columns)
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    ).all()
+
+def get_cart_lines():
+    """The user's cart with product name, price, availability and totals.
+
+    One query joining cart_items to products, for GET /cart/?expand=product.
+    """
+    user_id = int(get_jwt_identity())
+    rows = db.session.execute(
+        select(*cart_line_serializer.columns)
+        .join(Product, Product.id == CartItem.product_id)
+        .outerjoin(StockReservation, (StockReservation.user_id == CartItem.user_id)
+                   & (StockReservation.product_id == CartItem.product_id))
+        .where(CartItem.user_id == user_id)
+        .order_by(CartItem.id)
+    ).all()
+    items = cart_line_serializer.many(rows)
+    return {
+        "items": items,
+        "item_count": sum(item["quantity"] for item in items),
+        "subtotal": sum(item["line_total"] for item in items),
+        "available": all(item["available"] for item in items),
+    }
 
 def remove_from_cart(item_id):
     user_id = int(get_jwt_identity())
@@ -35,7 +152,10 @@ def remove_from_cart(item_id):
         abort(404, "Cart item not found or access denied")
 
     db.session.delete(item)
+    released = release(user_id, item.product_id) if reservations_enabled() else []
     db.session.commit()
+    if released:
+        stock_changed(*released)
     return True
 
 def update_cart_quantity(item_id, quantity):
@@ -45,11 +165,26 @@ def update_cart_quantity(item_id, quantity):
     if not item or item.user_id != user_id:
         abort(404, "Cart item not found or access denied")
 
+    changed = []
+    if reservations_enabled():
+        if quantity > item.quantity:
+            if not reserve(user_id, {item.product_id: quantity - item.quantity}):
+                db.session.rollback()
+                abort(409, "Not enough stock to reserve")
+            changed = [item.product_id]
+        elif quantity < item.quantity:
+            changed = release(user_id, item.product_id, item.quantity - quantity)
+
     item.quantity = quantity
     db.session.commit()
+    if changed:
+        stock_changed(*changed)
     return item
 
 def clear_user_cart():
     user_id = int(get_jwt_identity())
     CartItem.query.filter_by(user_id=user_id).delete()
+    released = release(user_id) if reservations_enabled() else []
     db.session.commit()
+    if released:
+        stock_changed(*released)
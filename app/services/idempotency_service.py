@@ -0,0 +1,114 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timedelta
+from app import db
+from app.models.models import IdempotencyKey
+from flask import current_app
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+# Key rows are handled with Core statements so they never sit in the session's
+# identity map alongside the checkout's ORM objects.
+keys = IdempotencyKey.__table__
+
+POLL_INTERVAL = 0.05
+
+
+def _request_hash(payload):
+    raw = json.dumps(payload or {}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def purge_expired_keys():
+    result = db.session.execute(delete(keys).where(keys.c.expires_at <= datetime.utcnow()))
+    db.session.commit()
+    return result.rowcount
+
+
+def _claim(user_id, key, request_hash):
+    try:
+        record_id = db.session.execute(
+            insert(keys).values(
+                user_id=user_id,
+                key=key,
+                request_hash=request_hash,
+                status="in_progress",
+                created_at=datetime.utcnow(),
+                expires_at=datetime.utcnow() + timedelta(seconds=current_app.config["IDEMPOTENCY_LOCK_TIMEOUT"]),
+            )
+        ).inserted_primary_key[0]
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return None
+    return record_id
+
+
+def _find(user_id, key):
+    # Start a fresh transaction so we see what other workers committed
+    db.session.rollback()
+    return db.session.execute(
+        select(keys).where(keys.c.user_id == user_id, keys.c.key == key)
+    ).first()
+
+
+def _release(record_id):
+    db.session.execute(delete(keys).where(keys.c.id == record_id))
+    db.session.commit()
+
+
+def run_idempotent(user_id, key, payload, handler):
+    """Run ``handler`` at most once per (user_id, key).
+
+    ``handler`` returns ``(body, status)``. The first request claims the key and
+    stores the response; later requests with the same key get the stored
+    response back, and requests arriving while the first is still running wait
+    for it. Returns ``(body, status, replayed)``.
+    """
+    request_hash = _request_hash(payload)
+    purge_expired_keys()
+
+    deadline = time.monotonic() + current_app.config["IDEMPOTENCY_WAIT_TIMEOUT"]
+    while True:
+        record_id = _claim(user_id, key, request_hash)
+        if record_id:
+            break
+
+        existing = _find(user_id, key)
+        if existing is None:
+            continue  # Released or evicted since our insert failed; try again
+
+        if existing.request_hash != request_hash:
+            return {"msg": "Idempotency-Key was already used with a different request"}, 422, False
+
+        if existing.status == "completed":
+            return json.loads(existing.response_body), existing.response_code, True
+
+        if existing.expires_at <= datetime.utcnow():
+            # The worker holding the key died mid-request; take it over
+            _release(existing.id)
+            continue
+
+        if time.monotonic() >= deadline:
+            return {"msg": "A request with this Idempotency-Key is still being processed"}, 409, False
+        time.sleep(POLL_INTERVAL)
+
+    try:
+        body, status = handler()
+    except Exception:
+        db.session.rollback()
+        _release(record_id)
+        raise
+
+    db.session.execute(
+        update(keys).where(keys.c.id == record_id).values(
+            status="completed",
+            response_code=status,
+            response_body=json.dumps(body),
+            expires_at=datetime.utcnow() + timedelta(seconds=current_app.config["IDEMPOTENCY_KEY_TTL"]),
+        )
+    )
+    db.session.commit()
+
+    return body, status, False
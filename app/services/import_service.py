@@ -0,0 +1,146 @@
+import csv
+import io
+import json
+from app import cache, db
+from app.models.models import Product, User
+from app.services.product_services import PRODUCT_FIELDS, REQUIRED_PRODUCT_FIELDS
+from app.services.suggest_service import reset_suggestions
+from flask import current_app
+from sqlalchemy import insert
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Error details kept in the report; the count covers all of them
+MAX_REPORTED_ERRORS = 50
+
+
+def detect_format(filename, default=None):
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")):
+        return "ndjson"
+    return default
+
+
+def iter_csv(stream):
+    """``(line, row)`` for each data row of a CSV text stream with a header."""
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def iter_ndjson(stream):
+    """``(line, row)`` for each non-blank line; ``row`` is None if unparsable."""
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            yield line, json.loads(text)
+        except ValueError:
+            yield line, None
+
+
+def iter_rows(stream, fmt):
+    """Rows of a binary or text stream, read lazily."""
+    if isinstance(stream, io.TextIOBase):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    return iter_csv(text) if fmt == "csv" else iter_ndjson(text)
+
+
+def _coerce(row):
+    """CSV cells are strings; convert them to what the model expects."""
+    item = {field: value for field, value in row.items() if field in PRODUCT_FIELDS}
+    for field, convert in (("price", float), ("stock", int)):
+        value = item.get(field)
+        if isinstance(value, str) and value.strip():
+            try:
+                item[field] = convert(value)
+            except ValueError:
+                pass
+    if item.get("description") == "":
+        item["description"] = None
+    return item
+
+
+def validate_row(row):
+    """``(values, errors)`` for one parsed row, checked like the bulk endpoint."""
+    if not isinstance(row, dict):
+        return None, {"row": "Not a JSON object" if row is not None else "Unparsable line"}
+
+    item = _coerce(row)
+    errors = {field: "Missing" for field in REQUIRED_PRODUCT_FIELDS if item.get(field) in (None, "")}
+    for field, valid in PRODUCT_FIELDS.items():
+        if field in item and field not in errors and not valid(item[field]):
+            errors[field] = "Invalid value"
+    if errors:
+        return None, errors
+
+    return {
+        "name": item["name"],
+        "description": item.get("description"),
+        "price": item["price"],
+        "stock": item["stock"],
+        "image_url": item.get("image_url") or "",
+    }, None
+
+
+def import_products(rows, seller_id, batch_size=None, progress=None):
+    """Validate and insert ``(line, row)`` pairs for ``seller_id``.
+
+    Rows are consumed lazily and written in batches of ``batch_size`` (default
+    IMPORT_BATCH_SIZE), each in its own transaction, so memory stays bounded
+    by one batch however long the feed is. Invalid rows are skipped and
+    counted. ``progress(report)`` is called after every batch. Returns the
+    final report.
+    """
+    batch_size = max(batch_size or current_app.config["IMPORT_BATCH_SIZE"], 1)
+    if db.session.get(User, seller_id) is None:
+        raise ValueError(f"No user with id {seller_id}")
+
+    report = {"rows": 0, "imported": 0, "errors": 0, "error_details": []}
+    stmt = insert(Product.__table__)
+    batch = []
+
+    def flush():
+        try:
+            db.session.execute(stmt, batch)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        report["imported"] += len(batch)
+        batch.clear()
+        if progress:
+            progress(report)
+
+    try:
+        for line, row in rows:
+            report["rows"] += 1
+            values, errors = validate_row(row)
+            if errors:
+                report["errors"] += 1
+                if len(report["error_details"]) < MAX_REPORTED_ERRORS:
+                    report["error_details"].append({"line": line, "errors": errors})
+                continue
+
+            values["seller_id"] = seller_id
+            batch.append(values)
+            if len(batch) >= batch_size:
+                flush()
+        if batch:
+            flush()
+    finally:
+        if report["imported"]:
+            _invalidate_imported()
+
+    return report
+
+
+def _invalidate_imported():
+    # Too many ids to track one by one; have every reader start over
+    cache.bump("products")
+    cache.bump("search")
+    reset_suggestions()
@@ -1,84 +1,210 @@
-from app import db
+import csv
+import io
+import logging
+from app import cache, db
+from app.core.etag import make_etag
+from app.core.json import encode
 from app.models.models import CartItem, Order, OrderItem, Product, Transaction
+from app.models.serializers import order_item_serializer, order_serializer
+from app.services.reservation_service import claim_reservations, reservations_enabled, stock_changed
+from app.services.stock_service import return_stock, take_sharded_stock
 from datetime import datetime
+from flask import abort
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
 
 
 def checkout(user_id, data=None):
-    print("✅ CHECKOUT STARTED for user_id:", user_id)
+    logger.debug("Checkout started", extra={"user_id": int(user_id)})
+
+    if data is None:
+        data = {}
 
     # Fetch cart items for the user
     cart_items = CartItem.query.filter_by(user_id=user_id).all()
-    print("→ CART ITEMS:", cart_items)
 
     if not cart_items:
-        print("🛒 Cart is empty.")
         return None, "Cart is empty"
 
-    total = 0
-    order = Order(user_id=user_id, total_amount=0, status="pending", created_at=datetime.utcnow())
-    db.session.add(order)
-    db.session.commit()  # Commit now to generate order.id
-
+    # Merge lines per product so each product is checked and decremented once
+    quantities = {}
     for item in cart_items:
-        product = db.session.get(Product, item.product_id)
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
 
-        if not product:
-            print(f"❌ Product ID {item.product_id} not found.")
-            return None, f"Product with ID {item.product_id} not found"
+    try:
+        # Stock the user already holds is sold as is; only the rest has to be
+        # taken from the product rows
+        claimed = claim_reservations(user_id, list(quantities)) if reservations_enabled() else {}
+        uncovered = {
+            pid: quantity - claimed.get(pid, 0) for pid, quantity in quantities.items()
+            if quantity > claimed.get(pid, 0)
+        }
 
-        if product.stock < item.quantity:
-            print(f"❌ Not enough stock for product {product.name}")
-            return None, f"Not enough stock for product '{product.name}'"
+        # Lock the single-row products still needing stock with one IN query.
+        # Rows are locked in id order so concurrent checkouts can't deadlock on
+        # each other. Sharded products are not locked; their buckets are
+        # decremented below.
+        products = {}
+        if uncovered:
+            products.update((p.id, p) for p in Product.query
+                            .filter(Product.id.in_(uncovered), Product.stock_shards == 0)
+                            .order_by(Product.id)
+                            .with_for_update())
+        rest = [pid for pid in quantities if pid not in products]
+        if rest:
+            products.update((p.id, p) for p in Product.query.filter(Product.id.in_(rest)))
 
-        # Deduct stock
-        product.stock -= item.quantity
-        total += product.price * item.quantity
+        for product_id, quantity in quantities.items():
+            product = products.get(product_id)
+            if not product:
+                db.session.rollback()
+                return None, f"Product with ID {product_id} not found"
+            if product_id in uncovered and not product.stock_shards and product.stock < uncovered[product_id]:
+                db.session.rollback()
+                return None, f"Not enough stock for product '{product.name}'"
 
-        order_item = OrderItem(
-            order_id=order.id,
-            product_id=product.id,
-            quantity=item.quantity,
-            unit_price=product.price
-        )
-        db.session.add(order_item)
+        sharded = {pid: products[pid].stock_shards for pid in quantities if products[pid].stock_shards}
+        single = {pid: quantity for pid, quantity in uncovered.items() if pid not in sharded}
+        if single:
+            # Deduct stock in one conditional UPDATE. The stock >= qty guard keeps
+            # this safe even where FOR UPDATE is a no-op (SQLite).
+            decrement = case(single, value=Product.id)
+            result = db.session.execute(
+                update(Product.__table__)
+                .where(Product.id.in_(single), Product.stock >= decrement)
+                .values(stock=Product.stock - decrement, version=Product.version + 1)
+            )
+            if result.rowcount != len(single):
+                db.session.rollback()
+                return None, "Not enough stock to complete checkout"
 
-    # Update total after processing items
-    order.total_amount = total
+        for product_id, quantity in uncovered.items():
+            if product_id in sharded and not take_sharded_stock(product_id, sharded[product_id], quantity):
+                db.session.rollback()
+                return None, f"Not enough stock for product '{products[product_id].name}'"
 
-    # Clear the user's cart
-    CartItem.query.filter_by(user_id=user_id).delete()
+        # Holds larger than what is being bought go back on the shelf
+        return_stock({pid: held - quantities[pid] for pid, held in claimed.items() if held > quantities[pid]})
 
-    db.session.commit()
+        for product in products.values():
+            db.session.expire(product, ["stock", "version"])
 
-    
-    if data is None:
-        data = {}
+        total = sum(products[pid].price * quantity for pid, quantity in quantities.items())
+        order = Order(user_id=user_id, total_amount=total, status="pending", created_at=datetime.utcnow())
+        db.session.add(order)
+        db.session.flush()  # Generate order.id without committing
 
-    method = data.get("payment_method", "bank_transfer")
+        db.session.execute(insert(OrderItem), [
+            {
+                "order_id": order.id,
+                "product_id": product_id,
+                "quantity": quantity,
+                "unit_price": products[product_id].price,
+            } for product_id, quantity in quantities.items()
+        ])
 
-    transaction = Transaction(
-        order_id=order.id,
-        method=method,
-        amount=order.total_amount,
-        status="pending"
-    )
-    db.session.add(transaction)
-    db.session.commit()
-    
+        db.session.add(Transaction(
+            order_id=order.id,
+            method=data.get("payment_method", "bank_transfer"),
+            amount=total,
+            status="pending"
+        ))
 
-    print("✅ CHECKOUT COMPLETE — Order ID:", order.id)
+        # Clear the user's cart
+        CartItem.query.filter_by(user_id=user_id).delete()
+
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    stock_changed(*quantities)
+    invalidate_orders(user_id)
+
+    logger.info("Checkout complete", extra={"user_id": int(user_id), "order_id": order.id})
     return order, None
 
 
-def get_user_orders(user_id):
-    return Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+def _order_payloads(*criteria):
+    """Serialized orders matching ``criteria`` with their items, newest first.
 
+    Reads plain rows in two queries (orders, then all their items) without
+    building ORM objects.
+    """
+    rows = db.session.execute(
+        select(*order_serializer.columns)
+        .where(*criteria)
+        .order_by(Order.created_at.desc())
+    ).all()
+    if not rows:
+        return []
+
+    orders = {}
+    for row in rows:
+        payload = order_serializer.from_row(row)
+        payload["items"] = []
+        orders[payload["id"]] = payload
+
+    item_rows = db.session.execute(
+        select(OrderItem.order_id, *order_item_serializer.columns)
+        .where(OrderItem.order_id.in_(orders))
+        .order_by(OrderItem.id)
+    ).all()
+    from_row = order_item_serializer.from_row
+    for row in item_rows:
+        orders[row[0]]["items"].append(from_row(row[1:]))
+
+    return list(orders.values())
+
+
+def invalidate_orders(user_id):
+    """Drop cached order reads for a user after their orders changed."""
+    cache.bump(f"orders:{int(user_id)}")
+
+
+def _orders_cache_key(user_id, suffix):
+    user_id = int(user_id)
+    return f"orders:{user_id}:{cache.generation(f'orders:{user_id}')}:{suffix}"
+
+
+def get_order_history_etag(user_id):
+    """ETag for GET /orders/me from the (id, version) of the user's orders."""
+    key = _orders_cache_key(user_id, "etag")
+    etag = cache.get(key)
+    if etag is None:
+        rows = db.session.execute(
+            select(Order.id, Order.version)
+            .where(Order.user_id == user_id)
+            .order_by(Order.created_at.desc())
+        ).all()
+        etag = make_etag("orders", int(user_id), [[row.id, row.version] for row in rows])
+        cache.set(key, etag)
+    return etag
+
+
+def get_order_history(user_id):
+    """Serialized GET /orders/me payload, served from cache when possible."""
+    key = _orders_cache_key(user_id, "list")
+    payload = cache.get(key)
+    if payload is None:
+        payload = _order_payloads(Order.user_id == user_id)
+        cache.set(key, payload)
+    return payload
+
+
+def get_order_payload(user_id, order_id):
+    key = _orders_cache_key(user_id, order_id)
+    payload = cache.get(key)
+    if payload is None:
+        orders = _order_payloads(Order.id == order_id, Order.user_id == user_id)
+        if not orders:
+            return None, "Order not found"
+        payload = orders[0]
+        cache.set(key, payload)
+    return payload, None
 
-def get_order_with_items(user_id, order_id):
-    order = Order.query.filter_by(id=order_id, user_id=user_id).first()
-    if not order:
-        return None, "Order not found"
-    return order, None
 
 def update_order_status(user_id, order_id, status):
     order = db.session.get(Order, order_id)
@@ -86,5 +212,110 @@ def update_order_status(user_id, order_id, status):
         return None, "Order not found"
 
     order.status = status
+    # Bumped in SQL so concurrent writers never lose an increment
+    order.version = Order.version + 1
     db.session.commit()
-    return order, None
\ No newline at end of file
+    invalidate_orders(order.user_id)
+    return order, None
+
+# One export row per order line, with its order and payment alongside
+EXPORT_COLUMNS = [
+    ("order_id", Order.id),
+    ("user_id", Order.user_id),
+    ("created_at", Order.created_at),
+    ("order_status", Order.status),
+    ("order_total", Order.total_amount),
+    ("item_id", OrderItem.id),
+    ("product_id", OrderItem.product_id),
+    ("seller_id", Product.seller_id),
+    ("quantity", OrderItem.quantity),
+    ("unit_price", OrderItem.unit_price),
+    ("line_total", (OrderItem.quantity * OrderItem.unit_price).label("line_total")),
+    ("transaction_id", Transaction.id),
+    ("payment_method", Transaction.method),
+    ("payment_status", Transaction.status),
+    ("payment_amount", Transaction.amount),
+]
+# Whole-order amounts include other sellers' lines, so only admins see them
+ADMIN_EXPORT_COLUMNS = ("order_total", "payment_amount")
+EXPORT_FORMATS = ("csv", "ndjson")
+
+# Rows fetched per round trip from the server-side cursor, and per chunk sent
+EXPORT_BATCH_SIZE = 1000
+
+
+def parse_since(value):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        abort(400, "Invalid 'since', expected an ISO 8601 date or datetime")
+
+
+def _export_columns(role):
+    if role == "admin":
+        return EXPORT_COLUMNS
+    return [(name, column) for name, column in EXPORT_COLUMNS if name not in ADMIN_EXPORT_COLUMNS]
+
+
+def _export_statement(user_id, role, since):
+    stmt = (
+        select(*(column for _, column in _export_columns(role)))
+        .select_from(OrderItem)
+        .join(Order, Order.id == OrderItem.order_id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .outerjoin(Transaction, Transaction.order_id == Order.id)
+        .order_by(Order.id, OrderItem.id)
+    )
+    # Sellers only see the lines for their own products
+    if role != "admin":
+        stmt = stmt.where(Product.seller_id == int(user_id))
+    if since is not None:
+        stmt = stmt.where(Order.created_at >= since)
+    return stmt.execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+
+def _csv_chunks(keys, partitions):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(keys)
+    yield buffer.getvalue().encode()
+
+    for rows in partitions:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(
+            [value.isoformat() if isinstance(value, datetime) else value for value in row] for row in rows
+        )
+        yield buffer.getvalue().encode()
+
+
+def _ndjson_chunks(keys, partitions):
+    for rows in partitions:
+        yield b"".join(
+            encode({key: value.isoformat() if isinstance(value, datetime) else value for key, value in zip(keys, row)})
+            + b"\n"
+            for row in rows
+        )
+
+
+def iter_order_export(user_id, role, since, fmt):
+    """Encoded chunks of the order export, read through a server-side cursor.
+
+    Admins get every order line; sellers get the lines for their products,
+    without the order and payment totals.
+    Only one batch of rows is held at a time, so memory does not grow with
+    the size of the export. Must be iterated inside the request (see
+    ``stream_with_context``).
+    """
+    result = db.session.execute(_export_statement(user_id, role, since))
+    keys = [name for name, _ in _export_columns(role)]
+    try:
+        partitions = result.partitions()
+        if fmt == "csv":
+            yield from _csv_chunks(keys, partitions)
+        else:
+            yield from _ndjson_chunks(keys, partitions)
+    finally:
+        result.close()
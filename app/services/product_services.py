@@ -1,16 +1,71 @@
-import sys
-from app import db
+import base64
+import json
+import logging
+from datetime import datetime
+from app import cache, db
+from app.core.etag import make_etag
 from app.models.models import Product
-from flask import abort
+from app.models.serializers import product_serializer
+from app.services.search_index import reindex_products
+from app.services.stock_service import configure_stock_shards, held_stock, set_sharded_stock, sharded_products
+from app.services.suggest_service import refresh_suggestions
+from flask import abort, current_app
 from flask_jwt_extended import get_jwt_identity, get_jwt
-from sqlalchemy import asc, desc
+from sqlalchemy import (
+    String, asc, bindparam, case, cast, delete, desc, func, insert, literal_column, select, tuple_, union_all,
+    update,
+)
+
+logger = logging.getLogger(__name__)
+
+
+# Columns the listing can be ordered by; anything else falls back to id
+SORTABLE_COLUMNS = {
+    "id": Product.id,
+    "name": Product.name,
+    "price": Product.price,
+    "stock": Product.stock,
+    "seller_id": Product.seller_id,
+    "created_at": Product.created_at,
+}
+
+# Query-string arguments that affect the listing output, with their parsers
+LISTING_ARGS = {
+    "seller_id": int,
+    "min_price": float,
+    "max_price": float,
+    "in_stock": str,
+    "page": int,
+    "limit": int,
+    "cursor": str,
+    "include_total": str,
+    "facets": str,
+}
+
+# Facets the listing can return counts for, see get_product_facets
+FACETS = ("price", "seller", "in_stock")
+
+
+def invalidate_products(*product_ids):
+    """Drop cached reads after products were created, changed or deleted."""
+    cache.delete(*(f"product:{pid}" for pid in product_ids))
+    cache.delete(*(f"product:{pid}:etag" for pid in product_ids))
+    cache.bump("products")
+    refresh_suggestions(*product_ids)
+
+
+def _stock_shards(data, default=0):
+    shards = data.get("stock_shards", default)
+    max_shards = current_app.config["STOCK_MAX_SHARDS"]
+    if not isinstance(shards, int) or isinstance(shards, bool) or not 0 <= shards <= max_shards:
+        abort(400, f"stock_shards must be an integer from 0 to {max_shards}")
+    return shards
 
 
 def create_product(data):
     user_id = int(get_jwt_identity())
     claims = get_jwt()
-    print("CREATE DATA:", data, file=sys.stderr, flush=True)
-    print("JWT IDENTITY:", user_id, "ROLE:", claims["role"], file=sys.stderr, flush=True)
+    logger.debug("Creating product", extra={"user_id": user_id, "role": claims["role"]})
 
     if claims["role"] not in ["admin", "seller"]:
         abort(403, "Only admin or seller can create products")
@@ -25,25 +80,28 @@ def create_product(data):
             seller_id=user_id,
         )
     except Exception as e:
-        print("CREATE PRODUCT ERROR:", e, file=sys.stderr, flush=True)
+        logger.warning("Invalid product data: %r", e)
         raise
 
+    shards = _stock_shards(data)
     try:
         db.session.add(product)
+        if shards:
+            db.session.flush()
+            configure_stock_shards(product, shards)
         db.session.commit()
     except Exception as e:
-        print("DB COMMIT ERROR:", e, file=sys.stderr, flush=True)
+        logger.error("Storing product failed: %s", e)
         raise
 
+    invalidate_products(product.id)
+    reindex_products(product.id)
     return product
 
 
-def get_all_products(filters):
-    query = Product.query
-
-    # Filtering
+def apply_product_filters(query, filters):
     if filters.get("seller_id"):
-        query = query.filter_by(seller_id=int(filters["seller_id"]))
+        query = query.filter(Product.seller_id == int(filters["seller_id"]))
 
     if filters.get("min_price"):
         query = query.filter(Product.price >= float(filters["min_price"]))
@@ -54,20 +112,174 @@ def get_all_products(filters):
     if filters.get("in_stock") == "true":
         query = query.filter(Product.stock > 0)
 
-    # Sorting
+    return query
+
+
+def _price_buckets():
+    """``(label, upper_bound)`` pairs for the price facet, last one open-ended."""
+    bounds = current_app.config["PRODUCT_PRICE_BUCKETS"]
+    lower = [0] + bounds
+    labels = [f"{lo:g}-{hi:g}" for lo, hi in zip(lower, bounds)] + [f"{bounds[-1]:g}+"]
+    return list(zip(labels, bounds + [None]))
+
+
+def _facet_names(filters):
+    names = [name.strip() for name in filters.get("facets", "").split(",") if name.strip()]
+    unknown = set(names) - set(FACETS)
+    if unknown:
+        abort(400, f"Unknown facet: {', '.join(sorted(unknown))}")
+    return [name for name in FACETS if name in names]
+
+
+def _facet_value(name, buckets, columns):
+    if name == "price":
+        return case(
+            *((columns.price < bound, label) for label, bound in buckets[:-1]),
+            else_=buckets[-1][0],
+        )
+    if name == "seller":
+        return cast(columns.seller_id, String)
+    return case((columns.stock > 0, "true"), else_="false")
+
+
+def get_product_facets(filters, names):
+    """Counts per facet value over the filtered listing, in one query.
+
+    The filtered products are read once into a CTE; each facet is a GROUP BY
+    over it, combined with UNION ALL so any number of facets costs one round
+    trip. Price buckets come from PRODUCT_PRICE_BUCKETS and are always all
+    present.
+    """
+    buckets = _price_buckets()
+    filtered = apply_product_filters(
+        select(Product.price, Product.seller_id, Product.stock), filters
+    ).cte("filtered")
+    selects = []
+    for name in names:
+        values = select(_facet_value(name, buckets, filtered.c).label("value")).select_from(filtered).subquery()
+        selects.append(
+            select(literal_column(f"'{name}'").label("facet"), values.c.value, func.count().label("count"))
+            .group_by(values.c.value)
+        )
+
+    facets = {name: {} for name in names}
+    if "price" in facets:
+        facets["price"] = dict.fromkeys((label for label, _ in buckets), 0)
+    if "in_stock" in facets:
+        facets["in_stock"] = {"true": 0, "false": 0}
+    for row in db.session.execute(union_all(*selects)):
+        facets[row.facet][row.value] = row.count
+    return facets
+
+
+def _sort_params(filters):
     sort_by = filters.get("sort_by", "id")
-    order = filters.get("order", "asc")
+    if sort_by not in SORTABLE_COLUMNS:
+        sort_by = "id"
+    order = "asc" if filters.get("order", "asc") == "asc" else "desc"
+    return sort_by, order
+
+
+def page_args(filters):
+    # Same normalization Flask-SQLAlchemy's paginate(error_out=False) applies
+    try:
+        page = int(filters.get("page") or 1)
+        limit = int(filters.get("limit") or 10)
+    except ValueError:
+        abort(400, "page and limit must be integers")
+    return max(page, 1), limit if limit >= 1 else 20
+
 
-    sort_column = getattr(Product, sort_by, Product.id)
+def _encode_cursor(sort_by, order, product):
+    value = getattr(product, sort_by)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort_by, order, value, product.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor, sort_by, order):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort_by, cursor_order, value, last_id = json.loads(raw)
+        if sort_by == "created_at":
+            value = datetime.fromisoformat(value)
+        last_id = int(last_id)
+    except (ValueError, TypeError):
+        abort(400, "Invalid cursor")
+
+    # A cursor is only meaningful for the ordering it was issued for
+    if (cursor_sort_by, cursor_order) != (sort_by, order):
+        abort(400, "Cursor does not match sort_by/order")
+
+    return value, last_id
+
+
+def _page_statement(stmt, filters):
+    """Apply filters, ordering and the page window to a ``select()``.
+
+    In cursor mode the window has one row past the page so callers can tell
+    whether another page exists.
+    """
+    stmt = apply_product_filters(stmt, filters)
+
+    sort_by, order = _sort_params(filters)
+    sort_column = SORTABLE_COLUMNS[sort_by]
     sort_method = asc if order == "asc" else desc
-    query = query.order_by(sort_method(sort_column))
+    page, limit = page_args(filters)
+
+    cursor = filters.get("cursor")
+    if cursor:
+        value, last_id = _decode_cursor(cursor, sort_by, order)
+        position = tuple_(sort_column, Product.id)
+        if order == "asc":
+            stmt = stmt.filter(position > tuple_(value, last_id))
+        else:
+            stmt = stmt.filter(position < tuple_(value, last_id))
+
+    # id breaks ties so pages are stable
+    stmt = stmt.order_by(sort_method(sort_column), sort_method(Product.id))
+
+    if "cursor" in filters:
+        return stmt.limit(limit + 1)
+    return stmt.offset((page - 1) * limit).limit(limit)
+
+
+def get_all_products(filters):
+    """One listing page as fully loaded ``Product`` instances."""
+    return db.session.execute(_page_statement(select(Product), filters)).scalars().all()
+
+
+def get_product_rows(filters):
+    """Lightweight listing read for the list endpoint.
 
-    # Pagination
-    page = int(filters.get("page", 1))
-    limit = int(filters.get("limit", 10))
-    paginated = query.paginate(page=page, per_page=limit, error_out=False)
+    Selects only the columns ``product_serializer`` needs (plus the sort
+    column) and returns plain rows, so no ORM objects are built and nothing
+    goes through the session's identity map. Returns
+    ``(rows, next_cursor, total)``; ``next_cursor`` is only set in cursor mode
+    and ``total`` only with ``include_total=true``.
+    """
+    sort_by, order = _sort_params(filters)
+    columns = list(product_serializer.columns)
+    if sort_by not in product_serializer.keys:
+        columns.append(SORTABLE_COLUMNS[sort_by])
 
-    return paginated.items
+    total = None
+    if filters.get("include_total") == "true":
+        total = db.session.execute(
+            apply_product_filters(select(func.count()).select_from(Product), filters)
+        ).scalar()
+
+    rows = db.session.execute(_page_statement(select(*columns), filters)).all()
+
+    next_cursor = None
+    if "cursor" in filters:
+        _, limit = page_args(filters)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(sort_by, order, rows[-1])
+
+    return rows, next_cursor, total
 
 
 def get_product_by_id(product_id):
@@ -78,6 +290,134 @@ def get_product_by_id(product_id):
     return product
 
 
+def _listing_cache_key(filters, generation):
+    normalized = {"page": 1, "limit": 10}
+    for name, parse in LISTING_ARGS.items():
+        # Empty values are skipped, as apply_product_filters ignores them
+        if filters.get(name):
+            try:
+                normalized[name] = parse(filters[name])
+            except ValueError:
+                abort(400, f"Invalid value for {name}")
+    normalized["sort_by"], normalized["order"] = _sort_params(filters)
+    return "products:list:%d:%s" % (
+        generation,
+        json.dumps(normalized, sort_keys=True, separators=(",", ":")),
+    )
+
+
+def _listing_facets(filters, names, generation):
+    # Shared by the ETag and the body so a cold request counts only once
+    key = _listing_cache_key(filters, generation) + ":facets"
+    facets = cache.get(key)
+    if facets is None:
+        facets = get_product_facets(filters, names)
+        if cache.generation("products") == generation:
+            cache.set(key, facets)
+    return facets
+
+
+def get_product_listing_etag(filters):
+    """ETag for a listing page, derived from the (id, version) of its rows.
+
+    Only the key columns of the page window are read, so checking costs a
+    fraction of building the body. Totals and facet counts are only computed
+    when the page includes them.
+    """
+    generation = cache.generation("products")
+    key = _listing_cache_key(filters, generation) + ":etag"
+    etag = cache.get(key)
+    if etag is not None:
+        return etag
+
+    rows = db.session.execute(_page_statement(select(Product.id, Product.version), filters)).all()
+    parts = [[row.id, row.version] for row in rows]
+    if filters.get("include_total") == "true":
+        parts.append(db.session.execute(
+            apply_product_filters(select(func.count()).select_from(Product), filters)
+        ).scalar())
+    facet_names = _facet_names(filters)
+    if facet_names:
+        parts.append(_listing_facets(filters, facet_names, generation))
+    etag = make_etag(_listing_cache_key(filters, 0), parts)
+
+    if cache.generation("products") == generation:
+        cache.set(key, etag)
+    return etag
+
+
+def get_product_listing(filters):
+    """Serialized GET /products/ payload, served from cache when possible."""
+    generation = cache.generation("products")
+    key = _listing_cache_key(filters, generation)
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    rows, next_cursor, total = get_product_rows(filters)
+    facet_names = _facet_names(filters)
+
+    # Passing ?cursor= (empty for the first page) switches to keyset pagination
+    if "cursor" in filters:
+        payload = {
+            "items": product_serializer.many(rows),
+            "next_cursor": next_cursor
+        }
+        if total is not None:
+            payload["total"] = total
+    elif facet_names:
+        payload = {"items": product_serializer.many(rows)}
+    else:
+        payload = product_serializer.many(rows)
+
+    if facet_names:
+        payload["facets"] = _listing_facets(filters, facet_names, generation)
+
+    # Skip the write if a product changed while we were reading
+    if cache.generation("products") == generation:
+        cache.set(key, payload)
+    return payload
+
+
+def get_product_etag(product_id):
+    key = f"product:{product_id}:etag"
+    generation = cache.generation("products")
+    etag = cache.get(key)
+    if etag is not None:
+        return etag
+
+    version = db.session.execute(
+        select(Product.version).where(Product.id == product_id)
+    ).scalar()
+    if version is None:
+        abort(404, "Product not found")
+
+    etag = make_etag("product", product_id, version)
+    if cache.generation("products") == generation:
+        cache.set(key, etag)
+    return etag
+
+
+def get_product_detail(product_id):
+    """Serialized GET /products/<id> payload, served from cache when possible."""
+    key = f"product:{product_id}"
+    generation = cache.generation("products")
+    payload = cache.get(key)
+    if payload is not None:
+        return payload
+
+    row = db.session.execute(
+        select(*product_serializer.columns).where(Product.id == product_id)
+    ).first()
+    if row is None:
+        abort(404, "Product not found")
+
+    payload = product_serializer.from_row(row)
+    if cache.generation("products") == generation:
+        cache.set(key, payload)
+    return payload
+
+
 def update_product(product_id, data):
     user_id = int(get_jwt_identity())
     claims = get_jwt()
@@ -90,13 +430,29 @@ def update_product(product_id, data):
     if user_id != product.seller_id and claims["role"] != "admin":
         abort(403, "Not authorized to update this product")
 
+    shards = _stock_shards(data, product.stock_shards)
+    if shards != product.stock_shards:
+        configure_stock_shards(product, shards)
+
     product.name = data.get("name", product.name)
     product.description = data.get("description", product.description)
     product.price = data.get("price", product.price)
-    product.stock = data.get("stock", product.stock)
+    if "stock" in data:
+        # The seller sends the total; the row only keeps what carts don't hold
+        held = held_stock([product.id]).get(product.id, 0)
+        if data["stock"] < held:
+            db.session.rollback()
+            abort(409, f"Stock can't go below the {held} units held in carts")
+        product.stock = data["stock"] - held
     product.image_url = data.get("image_url", product.image_url)
+    # Bumped in SQL, like the Core stock writes, so concurrent writers never lose an increment
+    product.version = Product.version + 1
+    if shards and "stock" in data:
+        set_sharded_stock(product.id, shards, product.stock)
 
     db.session.commit()
+    invalidate_products(product_id)
+    reindex_products(product_id)
     return product
 
 
@@ -114,4 +470,194 @@ def delete_product(product_id):
 
     db.session.delete(product)
     db.session.commit()
+    invalidate_products(product_id)
+    reindex_products(product_id)
     return True
+
+
+# Writable product fields with their validators, shared by the bulk endpoints
+PRODUCT_FIELDS = {
+    "name": lambda v: isinstance(v, str) and 0 < len(v.strip()) <= 255,
+    "description": lambda v: v is None or isinstance(v, str),
+    "price": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0,
+    "stock": lambda v: isinstance(v, int) and not isinstance(v, bool) and v >= 0,
+    "image_url": lambda v: v is None or (isinstance(v, str) and len(v) <= 255),
+}
+REQUIRED_PRODUCT_FIELDS = ("name", "price", "stock")
+
+
+def _validate_bulk_items(items, required):
+    """Per-item error dicts for a bulk payload; empty when everything is valid."""
+    max_items = current_app.config["PRODUCT_BULK_MAX_ITEMS"]
+    if not isinstance(items, list) or not items:
+        abort(400, "Expected a non-empty JSON array")
+    if len(items) > max_items:
+        abort(400, f"At most {max_items} items per request")
+
+    errors = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "errors": {"item": "Expected an object"}})
+            continue
+        item_errors = {field: "Missing" for field in required if field not in item}
+        for field, valid in PRODUCT_FIELDS.items():
+            if field in item and not valid(item[field]):
+                item_errors[field] = "Invalid value"
+        if item_errors:
+            errors.append({"index": index, "errors": item_errors})
+    return errors
+
+
+def _require_seller():
+    claims = get_jwt()
+    if claims["role"] not in ["admin", "seller"]:
+        abort(403, "Only admin or seller can manage products")
+    return int(get_jwt_identity()), claims["role"]
+
+
+def _check_bulk_targets(product_ids, user_id, role, action):
+    """Per-item errors for ids that are duplicated, missing or not owned."""
+    owners = dict(db.session.execute(
+        select(Product.id, Product.seller_id).where(Product.id.in_(set(product_ids)))
+    ).all())
+
+    errors, seen = [], set()
+    for index, product_id in enumerate(product_ids):
+        if product_id in seen:
+            errors.append({"index": index, "errors": {"id": "Duplicate id"}})
+        elif product_id not in owners:
+            errors.append({"index": index, "errors": {"id": "Product not found"}})
+        elif owners[product_id] != user_id and role != "admin":
+            errors.append({"index": index, "errors": {"id": f"Not authorized to {action} this product"}})
+        seen.add(product_id)
+    return errors
+
+
+def _is_id(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def bulk_create_products(items):
+    """Create many products in one transaction.
+
+    Every item is validated before anything is written; if any fails the
+    result is ``(None, errors)`` and nothing is stored. Otherwise the rows go
+    out as one executemany INSERT and ``(results, None)`` lists the new id of
+    each item in request order.
+    """
+    user_id, _ = _require_seller()
+    errors = _validate_bulk_items(items, REQUIRED_PRODUCT_FIELDS)
+    if errors:
+        return None, errors
+
+    rows = [
+        {
+            "name": item["name"],
+            "description": item.get("description"),
+            "price": item["price"],
+            "stock": item["stock"],
+            "image_url": item.get("image_url", ""),
+            "seller_id": user_id,
+        } for item in items
+    ]
+    products = Product.__table__
+    try:
+        ids = db.session.execute(
+            insert(products).returning(products.c.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_products(*ids)
+    reindex_products(*ids)
+    return [{"index": i, "id": product_id, "status": "created"} for i, product_id in enumerate(ids)], None
+
+
+def bulk_update_products(items):
+    """Partially update many products in one transaction.
+
+    Each item needs an ``id`` plus the fields to change. Items changing the
+    same set of fields share one executemany UPDATE, which also bumps
+    ``version``. Returns ``(results, None)`` or ``(None, errors)`` like
+    ``bulk_create_products``.
+    """
+    user_id, role = _require_seller()
+    errors = _validate_bulk_items(items, ("id",))
+    if not errors:
+        bad_ids = [
+            {"index": i, "errors": {"id": "Invalid value"}} for i, item in enumerate(items) if not _is_id(item["id"])
+        ]
+        errors = bad_ids or _check_bulk_targets([item["id"] for item in items], user_id, role, "update")
+    if errors:
+        return None, errors
+
+    # The stock sent is the total; the row only keeps what carts don't hold
+    stock = {item["id"]: item["stock"] for item in items if "stock" in item}
+    held = held_stock(stock) if stock else {}
+    errors = [
+        {"index": i, "errors": {"stock": f"Below the {held[item['id']]} units held in carts"}}
+        for i, item in enumerate(items) if "stock" in item and item["stock"] < held.get(item["id"], 0)
+    ]
+    if errors:
+        db.session.rollback()
+        return None, errors
+    stock = {product_id: total - held.get(product_id, 0) for product_id, total in stock.items()}
+
+    groups = {}
+    for item in items:
+        fields = tuple(sorted(field for field in item if field in PRODUCT_FIELDS))
+        if fields:
+            params = {"_id": item["id"], **{field: item[field] for field in fields}}
+            if "stock" in params:
+                params["stock"] = stock[item["id"]]
+            groups.setdefault(fields, []).append(params)
+
+    products = Product.__table__
+    try:
+        for fields, params in groups.items():
+            stmt = (
+                update(products)
+                .where(products.c.id == bindparam("_id"))
+                .values({**{field: bindparam(field) for field in fields}, "version": products.c.version + 1})
+            )
+            db.session.execute(stmt, params)
+        # New totals for sharded products are spread over their buckets
+        for product_id, shards in (sharded_products(stock) if stock else {}).items():
+            set_sharded_stock(product_id, shards, stock[product_id])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    ids = [item["id"] for item in items]
+    invalidate_products(*ids)
+    reindex_products(*ids)
+    return [{"index": i, "id": product_id, "status": "updated"} for i, product_id in enumerate(ids)], None
+
+
+def bulk_delete_products(product_ids):
+    """Delete many products with one DELETE; same contract as the others."""
+    user_id, role = _require_seller()
+    max_items = current_app.config["PRODUCT_BULK_MAX_ITEMS"]
+    if not isinstance(product_ids, list) or not product_ids:
+        abort(400, "Expected a non-empty JSON array of ids")
+    if len(product_ids) > max_items:
+        abort(400, f"At most {max_items} items per request")
+
+    errors = [{"index": i, "errors": {"id": "Invalid value"}} for i, pid in enumerate(product_ids) if not _is_id(pid)]
+    errors = errors or _check_bulk_targets(product_ids, user_id, role, "delete")
+    if errors:
+        return None, errors
+
+    try:
+        db.session.execute(delete(Product.__table__).where(Product.__table__.c.id.in_(product_ids)))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    invalidate_products(*product_ids)
+    reindex_products(*product_ids)
+    return [{"index": i, "id": product_id, "status": "deleted"} for i, product_id in enumerate(product_ids)], None
@@ -0,0 +1,189 @@
+import threading
+from datetime import datetime, timedelta
+from app import db
+from app.models.models import StockReservation
+from app.services.product_services import invalidate_products
+from app.services.stock_service import refresh_stock_totals, return_stock, take_stock
+from flask import current_app
+from sqlalchemy import delete, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import SQLAlchemyError
+
+reservations = StockReservation.__table__
+
+# Holds are upserted with ON CONFLICT, which only these dialects provide
+RESERVATION_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def reservations_enabled():
+    return current_app.config["STOCK_RESERVATIONS"]
+
+
+def stock_changed(*product_ids):
+    """After a committed stock change: roll up sharded totals, drop cached reads."""
+    refresh_stock_totals(product_ids)
+    invalidate_products(*product_ids)
+
+
+def _sum_by_product(rows):
+    totals = {}
+    for product_id, quantity in rows:
+        totals[product_id] = totals.get(product_id, 0) + quantity
+    return totals
+
+
+def reserve(user_id, quantities):
+    """Hold ``{product_id: quantity}`` more stock for the user's cart.
+
+    Runs in the caller's transaction and does not commit. Returns False,
+    leaving the transaction to be rolled back, if any product lacks stock.
+    Holding more of a product extends its expiry.
+    """
+    if not take_stock(quantities):
+        return False
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=current_app.config["STOCK_RESERVATION_TTL"])
+    dialect_insert = RESERVATION_INSERTS[db.engine.dialect.name]
+    stmt = dialect_insert(reservations).values([
+        {"user_id": user_id, "product_id": pid, "quantity": qty, "created_at": now, "expires_at": expires_at}
+        for pid, qty in quantities.items()
+    ])
+    db.session.execute(stmt.on_conflict_do_update(
+        index_elements=[reservations.c.user_id, reservations.c.product_id],
+        set_={"quantity": reservations.c.quantity + stmt.excluded.quantity, "expires_at": expires_at},
+    ))
+    return True
+
+
+def release(user_id, product_id=None, quantity=None):
+    """Give back held stock: all of it, one product's, or ``quantity`` of it.
+
+    Runs in the caller's transaction and does not commit. Returns the ids of
+    products whose stock changed.
+    """
+    criteria = [reservations.c.user_id == user_id]
+    if product_id is not None:
+        criteria.append(reservations.c.product_id == product_id)
+
+    if quantity is None:
+        rows = db.session.execute(
+            delete(reservations).where(*criteria).returning(reservations.c.product_id, reservations.c.quantity)
+        ).all()
+        returned = _sum_by_product(rows)
+    else:
+        held = db.session.execute(
+            select(reservations.c.id, reservations.c.quantity).where(*criteria).with_for_update()
+        ).first()
+        if held is None:
+            return []
+        give_back = min(quantity, held.quantity)
+        if give_back == held.quantity:
+            db.session.execute(delete(reservations).where(reservations.c.id == held.id))
+        else:
+            db.session.execute(
+                update(reservations)
+                .where(reservations.c.id == held.id)
+                .values(quantity=reservations.c.quantity - give_back)
+            )
+        returned = {product_id: give_back}
+
+    return_stock(returned)
+    return list(returned)
+
+
+def claim_reservations(user_id, product_ids):
+    """Take the user's holds on ``product_ids`` for checkout.
+
+    Deletes the rows and returns ``{product_id: quantity}``; that stock is
+    already out of ``Product.stock`` so the caller just sells it. Expired
+    holds the sweeper hasn't reached yet still count, since their stock was
+    never handed back. Runs in the caller's transaction.
+    """
+    rows = db.session.execute(
+        delete(reservations)
+        .where(reservations.c.user_id == user_id, reservations.c.product_id.in_(product_ids))
+        .returning(reservations.c.product_id, reservations.c.quantity)
+    ).all()
+    return _sum_by_product(rows)
+
+
+def release_expired(batch_size=None, product_ids=None):
+    """Expire up to ``batch_size`` holds and return their stock.
+
+    Commits on its own. Each hold is deleted with DELETE ... RETURNING, so
+    concurrent sweepers (or a checkout claiming the same hold) never hand
+    the same stock back twice. Returns how many holds were released.
+    """
+    batch_size = batch_size or current_app.config["RESERVATION_SWEEP_BATCH"]
+    expired = select(reservations.c.id).where(reservations.c.expires_at <= datetime.utcnow())
+    if product_ids:
+        expired = expired.where(reservations.c.product_id.in_(product_ids))
+    expired = expired.order_by(reservations.c.expires_at).limit(batch_size).with_for_update(skip_locked=True)
+
+    try:
+        rows = db.session.execute(
+            delete(reservations)
+            .where(reservations.c.id.in_(expired.scalar_subquery()))
+            .returning(reservations.c.product_id, reservations.c.quantity)
+        ).all()
+        returned = _sum_by_product(rows)
+        return_stock(returned)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+
+    if returned:
+        stock_changed(*returned)
+    return len(rows)
+
+
+def sweep_expired():
+    """Release every expired hold, one batch at a time."""
+    batch_size = current_app.config["RESERVATION_SWEEP_BATCH"]
+    total = 0
+    while True:
+        released = release_expired(batch_size)
+        total += released
+        if released < batch_size:
+            return total
+
+
+class ReservationSweeper:
+    """Background thread expiring holds every RESERVATION_SWEEP_INTERVAL seconds."""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config["RESERVATION_SWEEP_INTERVAL"]
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="reservation-sweeper", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    sweep_expired()
+                except SQLAlchemyError:
+                    self.app.logger.exception("Expiring stock reservations failed")
+                finally:
+                    db.session.remove()
+
+
+def init_reservations(app):
+    if not app.config["STOCK_RESERVATIONS"]:
+        return
+    with app.app_context():
+        dialect = db.engine.dialect.name
+    if dialect not in RESERVATION_INSERTS:
+        raise RuntimeError(f"STOCK_RESERVATIONS needs PostgreSQL or SQLite, not {dialect}")
+    if app.config["RESERVATION_SWEEP_INTERVAL"] > 0:
+        app.extensions["reservation_sweeper"] = ReservationSweeper(app).start()
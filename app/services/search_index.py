@@ -0,0 +1,81 @@
+"""The in-process product search index and its upkeep after writes.
+
+Kept apart from the search queries so the product write paths can reindex
+without importing them.
+"""
+import threading
+from app import cache, db
+from app.core.search import InvertedIndex
+from app.models.models import Product
+from flask import current_app
+from sqlalchemy import select
+
+
+class _IndexState:
+    def __init__(self):
+        self.index = None
+        self.generation = None
+        self.lock = threading.Lock()
+
+
+def _state():
+    return current_app.extensions.setdefault("product_search", _IndexState())
+
+
+def use_postgres():
+    return db.engine.dialect.name == "postgresql"
+
+
+def _document(name, description):
+    return f"{name} {description or ''}"
+
+
+def ensure_index():
+    """The in-process index, rebuilt if another worker reindexed since."""
+    state = _state()
+    generation = cache.generation("search")
+    if state.index is not None and state.generation == generation:
+        return state.index
+
+    with state.lock:
+        if state.index is None or state.generation != generation:
+            index = InvertedIndex()
+            rows = db.session.execute(
+                select(Product.id, Product.name, Product.description).execution_options(yield_per=1000)
+            )
+            for row in rows:
+                index.add(row.id, _document(row.name, row.description))
+            state.index, state.generation = index, generation
+    return state.index
+
+
+def reindex_products(*product_ids):
+    """Bring the search index up to date after products were written.
+
+    On Postgres the GIN index is maintained by the database and this is a
+    no-op. Otherwise the given ids are re-read and replaced (or removed) in
+    this process's index, and the "search" generation is bumped so other
+    workers rebuild theirs.
+    """
+    if use_postgres() or not product_ids:
+        return
+
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.description).where(Product.id.in_(product_ids))
+    ).all()
+
+    state = _state()
+    generation = cache.bump("search")
+    with state.lock:
+        if state.index is None:
+            return
+        found = set()
+        for row in rows:
+            state.index.add(row.id, _document(row.name, row.description))
+            found.add(row.id)
+        for product_id in set(product_ids) - found:
+            state.index.remove(product_id)
+
+        # Only still current if nobody else reindexed in between
+        if state.generation == generation - 1:
+            state.generation = generation
@@ -0,0 +1,63 @@
+from app import db
+from app.models.models import Product, product_search_document
+from app.models.serializers import product_serializer
+from app.services.product_services import apply_product_filters, page_args
+from app.services.search_index import ensure_index, use_postgres
+from sqlalchemy import func, literal_column, select
+
+# Ranked ids checked against the filters per query when searching in-process
+FILTER_CHUNK_SIZE = 500
+
+
+def _search_postgres(query, filters, page, limit):
+    ts_query = func.plainto_tsquery(literal_column("'english'"), query)
+    score = func.ts_rank(product_search_document, ts_query).label("score")
+    stmt = apply_product_filters(
+        select(*product_serializer.columns, score).where(product_search_document.op("@@")(ts_query)),
+        filters,
+    )
+    rows = db.session.execute(
+        stmt.order_by(score.desc(), Product.id).offset((page - 1) * limit).limit(limit)
+    ).all()
+    return [(row, row.score) for row in rows]
+
+
+def _search_in_process(query, filters, page, limit):
+    ranked = ensure_index().search(query)
+    wanted = page * limit
+
+    # Walk the ranking in chunks, letting the database drop rows that fail
+    # the filters, until the requested page is filled
+    results = []
+    for start in range(0, len(ranked), FILTER_CHUNK_SIZE):
+        chunk = ranked[start:start + FILTER_CHUNK_SIZE]
+        stmt = apply_product_filters(
+            select(*product_serializer.columns).where(Product.id.in_([doc_id for doc_id, _ in chunk])),
+            filters,
+        )
+        rows = {row.id: row for row in db.session.execute(stmt)}
+        results.extend((rows[doc_id], score) for doc_id, score in chunk if doc_id in rows)
+        if len(results) >= wanted:
+            break
+
+    return results[(page - 1) * limit:wanted]
+
+
+def search_products(query, filters):
+    """Products matching every word of ``query``, most relevant first.
+
+    Accepts the listing filters and page/limit. Each result carries a
+    ``score``; scores are only comparable within one response.
+    """
+    page, limit = page_args(filters)
+    if use_postgres():
+        results = _search_postgres(query, filters, page, limit)
+    else:
+        results = _search_in_process(query, filters, page, limit)
+
+    payload = []
+    for row, score in results:
+        item = product_serializer.from_row(row)
+        item["score"] = round(float(score), 6)
+        payload.append(item)
+    return payload
@@ -0,0 +1,205 @@
+"""Sharded stock counters for products that sell too fast for one row.
+
+A product with ``stock_shards = N`` keeps its stock in N
+``product_stock_shards`` rows. Checkouts decrement one randomly chosen
+bucket with a conditional UPDATE, so concurrent buyers mostly lock
+different rows instead of queueing on ``products``. ``Product.stock`` is
+then a rolled-up total, refreshed after each sale; the buckets are
+authoritative.
+"""
+import logging
+import random
+from app import db
+from app.models.models import Product, ProductStockShard, StockReservation
+from sqlalchemy import case, delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+products = Product.__table__
+buckets = ProductStockShard.__table__
+reservations = StockReservation.__table__
+
+logger = logging.getLogger(__name__)
+
+
+def sharded_products(product_ids):
+    """``{product_id: shard count}`` for the sharded products among ``product_ids``."""
+    return dict(db.session.execute(
+        select(products.c.id, products.c.stock_shards)
+        .where(products.c.id.in_(product_ids), products.c.stock_shards > 0)
+    ).all())
+
+
+def held_stock(product_ids):
+    """``{product_id: quantity}`` held for carts, expired holds included. No commit.
+
+    That stock is already out of ``Product.stock`` (or the buckets), so an
+    explicit new total has to have it subtracted; otherwise returning the
+    holds later would count it twice. The product rows are locked first so
+    no hold is added between this read and the caller's write.
+    """
+    db.session.execute(select(products.c.id).where(products.c.id.in_(product_ids)).with_for_update())
+    return dict(db.session.execute(
+        select(reservations.c.product_id, func.sum(reservations.c.quantity))
+        .where(reservations.c.product_id.in_(product_ids))
+        .group_by(reservations.c.product_id)
+    ).all())
+
+
+def _split(total, shards):
+    share, extra = divmod(total, shards)
+    return [share + (1 if shard < extra else 0) for shard in range(shards)]
+
+
+def set_sharded_stock(product_id, shards, total):
+    """Spread ``total`` evenly over ``shards`` fresh buckets. No commit."""
+    db.session.execute(delete(buckets).where(buckets.c.product_id == product_id))
+    db.session.execute(insert(buckets), [
+        {"product_id": product_id, "shard": shard, "stock": stock}
+        for shard, stock in enumerate(_split(total, shards))
+    ])
+
+
+def configure_stock_shards(product, shards):
+    """Switch ``product`` between single-row (0) and sharded (N) stock. No commit.
+
+    The current total carries over: read from the buckets (locked) when the
+    product is already sharded, else from ``product.stock``.
+    """
+    if product.stock_shards:
+        product.stock = sum(db.session.execute(
+            select(buckets.c.stock).where(buckets.c.product_id == product.id).with_for_update()
+        ).scalars())
+    if shards:
+        set_sharded_stock(product.id, shards, product.stock)
+    else:
+        db.session.execute(delete(buckets).where(buckets.c.product_id == product.id))
+    product.stock_shards = shards
+
+
+def take_sharded_stock(product_id, shards, quantity):
+    """Take ``quantity`` from a sharded product's buckets. No commit.
+
+    Tries a random bucket first, then the others, each with a conditional
+    UPDATE that only succeeds if that bucket alone covers the quantity. If
+    none does, all buckets are locked and drained in order. Returns False if
+    the buckets together hold too little.
+    """
+    start = random.randrange(shards)
+    for offset in range(shards):
+        result = db.session.execute(
+            update(buckets)
+            .where(
+                buckets.c.product_id == product_id,
+                buckets.c.shard == (start + offset) % shards,
+                buckets.c.stock >= quantity,
+            )
+            .values(stock=buckets.c.stock - quantity)
+        )
+        if result.rowcount:
+            return True
+
+    rows = db.session.execute(
+        select(buckets.c.shard, buckets.c.stock)
+        .where(buckets.c.product_id == product_id)
+        .order_by(buckets.c.shard)
+        .with_for_update()
+    ).all()
+    if sum(row.stock for row in rows) < quantity:
+        return False
+
+    taken = {}
+    for row in rows:
+        if quantity <= 0:
+            break
+        taken[row.shard] = min(row.stock, quantity)
+        quantity -= taken[row.shard]
+    db.session.execute(
+        update(buckets)
+        .where(buckets.c.product_id == product_id, buckets.c.shard.in_(taken))
+        .values(stock=buckets.c.stock - case(taken, value=buckets.c.shard))
+    )
+    return True
+
+
+def return_sharded_stock(product_id, shards, quantity):
+    """Put ``quantity`` back into a random bucket. No commit."""
+    db.session.execute(
+        update(buckets)
+        .where(buckets.c.product_id == product_id, buckets.c.shard == random.randrange(shards))
+        .values(stock=buckets.c.stock + quantity)
+    )
+
+
+def take_stock(quantities):
+    """Decrement ``{product_id: quantity}`` whatever each product's mode. No commit.
+
+    Single-row products go through one conditional UPDATE on ``products``,
+    sharded ones through their buckets. Returns False if anything is short;
+    the caller must then roll back.
+    """
+    sharded = sharded_products(quantities)
+    single = {pid: qty for pid, qty in quantities.items() if pid not in sharded}
+    if single:
+        decrement = case(single, value=products.c.id)
+        result = db.session.execute(
+            update(products)
+            .where(products.c.id.in_(single), products.c.stock >= decrement)
+            .values(stock=products.c.stock - decrement, version=products.c.version + 1)
+        )
+        if result.rowcount != len(single):
+            return False
+    return all(take_sharded_stock(pid, sharded[pid], quantities[pid]) for pid in sharded)
+
+
+def return_stock(quantities):
+    """Increment ``{product_id: quantity}`` whatever each product's mode. No commit."""
+    if not quantities:
+        return
+    sharded = sharded_products(quantities)
+    single = {pid: qty for pid, qty in quantities.items() if pid not in sharded}
+    if single:
+        increment = case(single, value=products.c.id)
+        db.session.execute(
+            update(products)
+            .where(products.c.id.in_(single))
+            .values(stock=products.c.stock + increment, version=products.c.version + 1)
+        )
+    for pid, shards in sharded.items():
+        return_sharded_stock(pid, shards, quantities[pid])
+
+
+def _roll_up(product_ids):
+    total = (
+        select(func.coalesce(func.sum(buckets.c.stock), 0))
+        .where(buckets.c.product_id == products.c.id)
+        .scalar_subquery()
+    )
+    targets = (
+        select(products.c.id)
+        .where(products.c.id.in_(product_ids), products.c.stock_shards > 0)
+        .with_for_update(skip_locked=True)
+    )
+    db.session.execute(
+        update(products)
+        .where(products.c.id.in_(targets.scalar_subquery()))
+        .values(stock=total, version=products.c.version + 1)
+    )
+
+
+def refresh_stock_totals(product_ids):
+    """Roll bucket totals up into ``Product.stock`` and commit.
+
+    Runs after the sale has committed, as its own short transaction, and is
+    best effort: the sale already stands, so a failure (lock timeout,
+    deadlock) is logged and the total catches up on the next rollup. On
+    Postgres a product row another rollup is already updating is skipped
+    (SKIP LOCKED) for the same reason.
+    """
+    if not product_ids:
+        return
+    try:
+        _roll_up(product_ids)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.warning("Rolling up sharded stock failed for products %s", list(product_ids), exc_info=True)
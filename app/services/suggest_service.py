@@ -0,0 +1,97 @@
+import threading
+import time
+from app import cache, db
+from app.core.suggest import SuggestIndex
+from app.models.models import Product
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+
+class _IndexState:
+    def __init__(self):
+        self.index = None
+        self.generation = None
+        self.built_at = 0.0
+        self.lock = threading.Lock()
+
+
+def _state(app=None):
+    return (app or current_app).extensions.setdefault("product_suggest", _IndexState())
+
+
+def _build(state):
+    generation = cache.generation("suggest")
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.stock).execution_options(yield_per=5000)
+    )
+    state.index = SuggestIndex.build(rows, max_k=current_app.config["SUGGEST_MAX_K"])
+    state.generation = generation
+    state.built_at = time.monotonic()
+
+
+def init_suggestions(app):
+    """Build the index while the app starts so the first request is fast.
+
+    Skipped quietly when the database is not reachable or not migrated yet;
+    the index is then built by the first lookup.
+    """
+    with app.app_context():
+        state = _state(app)
+        try:
+            _build(state)
+        except SQLAlchemyError:
+            state.index = None
+        finally:
+            db.session.remove()
+
+
+def _ensure_index():
+    """This process's index, rebuilt when it is missing or, at most every
+    SUGGEST_REBUILD_INTERVAL seconds, when another worker changed products."""
+    state = _state()
+    interval = current_app.config["SUGGEST_REBUILD_INTERVAL"]
+    stale = (
+        state.index is None
+        or (state.generation != cache.generation("suggest") and time.monotonic() - state.built_at >= interval)
+    )
+    if stale:
+        with state.lock:
+            if state.index is None or time.monotonic() - state.built_at >= interval:
+                _build(state)
+    return state.index
+
+
+def refresh_suggestions(*product_ids):
+    """Re-read the given products into this process's index after a write."""
+    state = _state()
+    if state.index is None or not product_ids:
+        return
+
+    rows = db.session.execute(
+        select(Product.id, Product.name, Product.stock).where(Product.id.in_(product_ids))
+    ).all()
+    found = set()
+    for row in rows:
+        state.index.add(row.id, row.name, row.stock)
+        found.add(row.id)
+    for product_id in set(product_ids) - found:
+        state.index.remove(product_id)
+
+    generation = cache.bump("suggest")
+    # Only still current if nobody else wrote in between
+    if state.generation == generation - 1:
+        state.generation = generation
+
+
+def reset_suggestions():
+    """Drop this process's index after a bulk load; the next lookup rebuilds it."""
+    _state().index = None
+    cache.bump("suggest")
+
+
+def suggest_products(prefix, k):
+    return [
+        {"id": product_id, "name": name, "stock": max(stock, 0)}
+        for product_id, name, stock in _ensure_index().suggest(prefix, k)
+    ]
@@ -0,0 +1,53 @@
+"""Product onboarding: looping POST /products/ vs POST /products/bulk.
+
+    python -m benchmarks.bench_bulk_products [--items 2000] [--batch 1000]
+"""
+import argparse
+import time
+from flask_jwt_extended import create_access_token
+from benchmarks.datagen import make_app, product_rows, seed_users
+from app import db
+from app.models.models import Product
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--items", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=1000)
+    args = parser.parse_args()
+
+    app = make_app()
+    app.config["JWT_SECRET_KEY"] = app.config["JWT_SECRET_KEY"] or "bench-secret-key-of-sufficient-length"
+    with app.app_context():
+        db.create_all()
+        seller_id = seed_users(1)[0]
+        token = create_access_token(identity=str(seller_id), additional_claims={"role": "seller"})
+        headers = {"Authorization": f"Bearer {token}"}
+        items = [
+            {key: row[key] for key in ("name", "description", "price", "stock", "image_url")}
+            for row in product_rows(args.items, [seller_id])
+        ]
+        client = app.test_client()
+
+        start = time.perf_counter()
+        for item in items:
+            assert client.post("/products/", json=item, headers=headers).status_code == 201
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, len(items), args.batch):
+            res = client.post("/products/bulk", json=items[offset:offset + args.batch], headers=headers)
+            assert res.status_code == 201
+        bulk = time.perf_counter() - start
+
+        assert db.session.query(Product).count() == 2 * args.items
+
+    print(f"{args.items} products, bulk batches of {args.batch}")
+    print(f"{'path':>8} {'s':>8} {'items/s':>10}")
+    print(f"{'single':>8} {single:>8.2f} {args.items / single:>10,.0f}")
+    print(f"{'bulk':>8} {bulk:>8.2f} {args.items / bulk:>10,.0f}")
+    print(f"bulk is {single / bulk:.1f}x the throughput of the single-item endpoint")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Listing read path: full ORM hydration vs column-projected rows.
+
+    python -m benchmarks.bench_listing [--products 20000] [--page-size 10000]
+"""
+import argparse
+import gc
+import time
+import tracemalloc
+from benchmarks.datagen import make_app, seed_products, seed_users
+from app import db
+from app.models.serializers import product_serializer
+from app.services.product_services import get_all_products, get_product_rows
+
+
+def orm_path(filters):
+    return [product_serializer.from_object(p) for p in get_all_products(filters)]
+
+
+def projected_path(filters):
+    rows, _, _ = get_product_rows(filters)
+    return product_serializer.many(rows)
+
+
+def measure(fn, filters, repeat):
+    timings = []
+    for _ in range(repeat):
+        db.session.expunge_all()
+        gc.collect()
+        start = time.perf_counter()
+        fn(filters)
+        timings.append(time.perf_counter() - start)
+
+    db.session.expunge_all()
+    gc.collect()
+    tracemalloc.start()
+    fn(filters)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return min(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=20000)
+    parser.add_argument("--page-size", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    app = make_app()
+    with app.app_context():
+        db.create_all()
+        seed_products(args.products, seed_users(20))
+
+        filters = {"limit": str(args.page_size), "sort_by": "price"}
+        assert orm_path(filters) == projected_path(filters)
+
+        print(f"{args.page_size} rows per page, {args.products} products")
+        print(f"{'path':>10} {'ms':>9} {'rows/s':>11} {'peak MiB':>9}")
+        results = {}
+        for name, fn in (("orm", orm_path), ("projected", projected_path)):
+            seconds, peak = measure(fn, filters, args.repeat)
+            results[name] = (seconds, peak)
+            print(f"{name:>10} {seconds * 1000:>9.1f} {args.page_size / seconds:>11,.0f} {peak / 2**20:>9.1f}")
+
+        (orm_s, orm_peak), (new_s, new_peak) = results["orm"], results["projected"]
+        print(f"projected is {orm_s / new_s:.1f}x faster and uses {orm_peak / new_peak:.1f}x less peak memory")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""Serialization microbenchmark: hand-built dicts + stdlib json vs row serializers.
+
+    python -m benchmarks.bench_serialization [--sizes 1000 10000] [--repeat 20]
+"""
+import argparse
+import json
+import random
+import time
+from flask import Flask
+from app.core.json import FastJSONProvider, orjson
+from app.models.serializers import product_serializer
+
+
+class ProductStub:
+    __slots__ = ("id", "name", "price", "stock", "seller_id")
+
+    def __init__(self, id, name, price, stock, seller_id):
+        self.id, self.name, self.price, self.stock, self.seller_id = id, name, price, stock, seller_id
+
+
+def make_rows(count, seed=42):
+    rnd = random.Random(seed)
+    return [
+        (i, f"Product {i}", round(rnd.uniform(1, 500), 2), rnd.randint(0, 1000), rnd.randint(1, 50))
+        for i in range(1, count + 1)
+    ]
+
+
+def best_of(repeat, fn):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    provider = FastJSONProvider(Flask(__name__))
+    print(f"orjson: {'yes' if orjson else 'no (stdlib fallback)'}")
+    print(f"{'rows':>8} {'baseline ms':>12} {'serializer ms':>14} {'speedup':>8}")
+
+    for size in args.sizes:
+        rows = make_rows(size)
+        objects = [ProductStub(*row) for row in rows]
+
+        def baseline():
+            json.dumps([{
+                "id": p.id,
+                "name": p.name,
+                "price": p.price,
+                "stock": p.stock,
+                "seller_id": p.seller_id
+            } for p in objects], sort_keys=True)
+
+        def fast():
+            provider.dumps_bytes(product_serializer.many(rows))
+
+        before = best_of(args.repeat, baseline) * 1000
+        after = best_of(args.repeat, fast) * 1000
+        print(f"{size:>8} {before:>12.2f} {after:>14.2f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
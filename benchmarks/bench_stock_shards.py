@@ -0,0 +1,113 @@
+"""Concurrent checkouts of one product: single stock row vs sharded stock.
+
+    python -m benchmarks.bench_stock_shards [--threads 16] [--orders 50] [--shards 16]
+
+Every thread checks out ``--orders`` one-unit orders of the same product,
+first with its stock on the product row, then spread over ``--shards``
+buckets. Without DATABASE_URL this runs on a temporary SQLite file, which
+serializes all writers anyway; point DATABASE_URL at Postgres to see the
+row-lock contention that sharding removes.
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+from sqlalchemy import func, insert, select  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from benchmarks.datagen import make_app, seed_users  # noqa: E402
+from app import db  # noqa: E402
+from app.models.models import CartItem, Order, Product, ProductStockShard  # noqa: E402
+from app.services.order_service import checkout  # noqa: E402
+from app.services.stock_service import configure_stock_shards  # noqa: E402
+
+
+def _buyer(app, user_id, product_id, orders, barrier, failures):
+    with app.app_context():
+        barrier.wait()
+        done = 0
+        while done < orders:
+            try:
+                db.session.execute(insert(CartItem), {"user_id": user_id, "product_id": product_id, "quantity": 1})
+                db.session.commit()
+                order, error = checkout(user_id)
+            except OperationalError:
+                # SQLite answers write contention with "database is locked"
+                db.session.rollback()
+                failures.append(user_id)
+                continue
+            assert error is None, error
+            done += 1
+        db.session.remove()
+
+
+def run(app, product_id, buyer_ids, orders):
+    barrier = threading.Barrier(len(buyer_ids) + 1)
+    failures = []
+    threads = [
+        threading.Thread(target=_buyer, args=(app, user_id, product_id, orders, barrier, failures))
+        for user_id in buyer_ids
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, len(failures)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=50, help="orders per thread")
+    parser.add_argument("--shards", type=int, default=16)
+    args = parser.parse_args()
+
+    app = make_app()
+    app.config["STOCK_MAX_SHARDS"] = max(app.config["STOCK_MAX_SHARDS"], args.shards)
+    total = args.threads * args.orders
+    results = []
+    with app.app_context():
+        db.create_all()
+        seller_id = seed_users(1)[0]
+        buyer_ids = seed_users(args.threads, role="user", prefix="buyer")
+
+        for shards in (0, args.shards):
+            product = Product(name=f"Drop {shards}", price=10.0, stock=total, seller_id=seller_id)
+            db.session.add(product)
+            db.session.flush()
+            if shards:
+                configure_stock_shards(product, shards)
+            db.session.commit()
+
+            elapsed, retries = run(app, product.id, buyer_ids, args.orders)
+
+            db.session.expire_all()
+            if shards:
+                left = db.session.scalar(
+                    select(func.sum(ProductStockShard.stock)).where(ProductStockShard.product_id == product.id)
+                )
+            else:
+                left = db.session.get(Product, product.id).stock
+            assert left == 0, f"{left} units left over"
+            assert db.session.get(Product, product.id).stock == 0
+            results.append((shards, elapsed, retries))
+
+        assert db.session.scalar(select(func.count(Order.id))) == 2 * total
+        dialect = db.engine.dialect.name
+
+    print(f"{dialect}: {args.threads} threads x {args.orders} checkouts of one product")
+    print(f"{'shards':>8} {'s':>8} {'orders/s':>10} {'retries':>8}")
+    for shards, elapsed, retries in results:
+        print(f"{shards or 'row':>8} {elapsed:>8.2f} {total / elapsed:>10,.0f} {retries:>8}")
+    print(f"sharded is {results[0][1] / results[1][1]:.2f}x the throughput of the single row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Autocomplete index: build time, memory and lookup latency.
+
+    python -m benchmarks.bench_suggest [--products 100000] [--lookups 20000]
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from benchmarks.datagen import WORDS, product_rows
+from app.core.suggest import SuggestIndex
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--products", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rows = [
+        (i, row["name"], row["stock"])
+        for i, row in enumerate(product_rows(args.products, [1], args.seed), start=1)
+    ]
+
+    gc.collect()
+    start = time.perf_counter()
+    index = SuggestIndex.build(rows)
+    build_seconds = time.perf_counter() - start
+
+    # Measured on a second build, tracing slows the first one down
+    del index
+    gc.collect()
+    tracemalloc.start()
+    index = SuggestIndex.build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    # Mostly short prefixes, like keystrokes in a search box
+    rnd = random.Random(args.seed)
+    prefixes = [rnd.choice(WORDS)[:rnd.randint(1, 6)] for _ in range(args.lookups)]
+    timings = []
+    for prefix in prefixes:
+        start = time.perf_counter()
+        index.suggest(prefix, 10)
+        timings.append(time.perf_counter() - start)
+
+    # Stock changes like checkouts make, then lookups against the patched index
+    start = time.perf_counter()
+    for i in range(1, 1001):
+        index.add(i, rows[i - 1][1], max(rows[i - 1][2] - 1, 0))
+    write_us = (time.perf_counter() - start) * 1000
+    after_writes = []
+    for prefix in prefixes[:2000]:
+        start = time.perf_counter()
+        index.suggest(prefix, 10)
+        after_writes.append(time.perf_counter() - start)
+
+    per_100k = 100000 / args.products
+    print(f"{args.products} products")
+    print(f"build: {build_seconds * 1000:.0f} ms ({build_seconds * 1000 * per_100k:.0f} ms per 100k)")
+    print(f"memory: {size / 2**20:.1f} MiB ({size * per_100k / 2**20:.1f} MiB per 100k)")
+    print(
+        f"lookup: p50 {percentile(timings, 50) * 1e6:.0f} us,"
+        f" p99 {percentile(timings, 99) * 1e6:.0f} us,"
+        f" max {max(timings) * 1e6:.0f} us over {args.lookups} prefixes"
+    )
+    print(f"update: {write_us:.0f} us per write, lookup p99 afterwards {percentile(after_writes, 99) * 1e6:.0f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""Deterministic data generation for benchmarks.
+
+Everything is derived from a seeded ``random.Random`` and written with bulk
+inserts, so two runs with the same arguments produce identical tables.
+"""
+import os
+import random
+from datetime import datetime, timedelta
+
+# Benchmarks run against a throwaway database unless DATABASE_URL says otherwise.
+# It has to be set before the app (and its Config) is imported.
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from sqlalchemy import func, insert, select  # noqa: E402
+
+from app import create_app, db  # noqa: E402
+from app.models.models import Order, OrderItem, Product, Transaction, User  # noqa: E402
+
+WORDS = [
+    "organic", "bamboo", "recycled", "apple", "banana", "coffee", "tea", "soap",
+    "bottle", "bag", "brush", "honey", "rice", "oat", "cotton", "shirt", "lamp",
+    "solar", "charger", "notebook", "pencil", "tomato", "spinach", "jar",
+]
+
+BATCH_SIZE = 5000
+
+# Seeded orders are spread over the 30 days before this moment
+ORDERS_END = datetime(2025, 1, 1)
+
+
+def make_app():
+    return create_app()
+
+
+def _batched(rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        yield rows[start:start + BATCH_SIZE]
+
+
+def seed_users(count, role="seller", prefix="seller"):
+    rows = [
+        {
+            "username": f"{prefix}{i}",
+            "email": f"{prefix}{i}@bench.local",
+            "password": "x",
+            "full_name": f"{prefix.title()} {i}",
+            "role": role,
+        } for i in range(1, count + 1)
+    ]
+    for batch in _batched(rows):
+        db.session.execute(insert(User), batch)
+    db.session.commit()
+    return [row[0] for row in db.session.execute(
+        db.select(User.id).where(User.role == role, User.username.startswith(prefix)).order_by(User.id)
+    )]
+
+
+def product_rows(count, seller_ids, seed=42):
+    rnd = random.Random(seed)
+    return [
+        {
+            "name": " ".join(rnd.choice(WORDS) for _ in range(3)).title() + f" {i}",
+            "description": " ".join(rnd.choice(WORDS) for _ in range(40)),
+            "price": round(rnd.uniform(1, 500), 2),
+            "stock": rnd.randint(0, 1000),
+            "image_url": f"https://img.bench.local/{i}.jpg",
+            "seller_id": rnd.choice(seller_ids),
+        } for i in range(1, count + 1)
+    ]
+
+
+def seed_products(count, seller_ids, seed=42):
+    for batch in _batched(product_rows(count, seller_ids, seed)):
+        db.session.execute(insert(Product), batch)
+    db.session.commit()
+    return [row[0] for row in db.session.execute(db.select(Product.id).order_by(Product.id))]
+
+
+def seed_orders(count, user_ids, product_ids, seed=42, max_items=4):
+    """``count`` orders with 1..max_items lines and a transaction each.
+
+    Ids continue from the current maximum so the rows can be written with
+    plain executemany INSERTs, without reading generated keys back.
+    """
+    rnd = random.Random(seed)
+    prices = dict(db.session.execute(select(Product.id, Product.price)).all())
+    next_order = (db.session.scalar(select(func.max(Order.id))) or 0) + 1
+    methods = ["bank_transfer", "card", "wallet"]
+
+    orders, items, transactions = [], [], []
+    for order_id in range(next_order, next_order + count):
+        lines = {pid: rnd.randint(1, 3) for pid in rnd.sample(product_ids, rnd.randint(1, max_items))}
+        total = round(sum(prices[pid] * qty for pid, qty in lines.items()), 2)
+        created_at = ORDERS_END - timedelta(seconds=rnd.randint(0, 30 * 24 * 3600))
+        orders.append({
+            "id": order_id, "user_id": rnd.choice(user_ids), "total_amount": total,
+            "status": rnd.choice(["pending", "paid", "shipped"]), "created_at": created_at,
+        })
+        items.extend(
+            {"order_id": order_id, "product_id": pid, "quantity": qty, "unit_price": prices[pid]}
+            for pid, qty in lines.items()
+        )
+        transactions.append({
+            "order_id": order_id, "method": rnd.choice(methods), "amount": total,
+            "status": "pending", "created_at": created_at,
+        })
+
+    for table, rows in ((Order, orders), (OrderItem, items), (Transaction, transactions)):
+        for batch in _batched(rows):
+            db.session.execute(insert(table), batch)
+    db.session.commit()
+    return [order["id"] for order in orders]
+
+
+def seed_dataset(users, products, orders, sellers=20, seed=42):
+    """Sellers, buyers, products and their orders; returns the ids by kind."""
+    seller_ids = seed_users(sellers)
+    user_ids = seed_users(users, role="user", prefix="buyer")
+    product_ids = seed_products(products, seller_ids, seed)
+    order_ids = seed_orders(orders, user_ids, product_ids, seed)
+    return {"sellers": seller_ids, "users": user_ids, "products": product_ids, "orders": order_ids}
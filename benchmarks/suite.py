@@ -0,0 +1,255 @@
+"""Scenario benchmarks for the whole API, compared against a saved baseline.
+
+    python -m benchmarks.suite [--users 200] [--products 5000] [--orders 2000]
+        [--requests 200] [--threads 8] [--output benchmarks/results.json]
+        [--baseline benchmarks/baseline.json] [--threshold 0.25] [--save-baseline]
+
+Seeds a fresh database with ``benchmarks.datagen`` and drives the API
+through the Flask test client in this process:
+
+- listing: every sort column and order, each with no filter, a seller, a
+  price range and in-stock only
+- cart add (POST /cart/) and cart read (GET /cart/?expand=product)
+- checkout from ``--threads`` threads at once
+- order history (GET /orders/me)
+
+Every request is instrumented and its query count read from the
+Server-Timing header. The read cache is cleared before each read so the
+numbers cover the database path. The results (p50/p95/p99 latency and
+queries per request per scenario) are written as JSON. With a baseline,
+the run fails (exit status 1) if a scenario's p95 is more than
+``--threshold`` slower than the baseline's, if it runs more queries per
+request or has more errors, or if a baseline scenario did not run.
+Without DATABASE_URL this uses a temporary SQLite file.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+
+if "DATABASE_URL" not in os.environ:
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}"
+
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from benchmarks.datagen import make_app, seed_dataset  # noqa: E402
+from app import cache, db  # noqa: E402
+from app.models.models import Product  # noqa: E402
+from app.services.product_services import SORTABLE_COLUMNS  # noqa: E402
+
+QUERIES = re.compile(r'desc="(\d+) queries"')
+
+LISTING_FILTERS = {
+    "all": {},
+    "seller": {"seller_id": None},  # filled in with a seeded seller
+    "price": {"min_price": "20", "max_price": "200"},
+    "in_stock": {"in_stock": "true"},
+}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(p / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+def summarize(samples, elapsed=None):
+    """Latency percentiles (ms), queries per request and errors of ``(seconds, queries, ok)`` samples."""
+    latencies = sorted(seconds * 1000 for seconds, _, _ in samples)
+    summary = {
+        "requests": len(samples),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "p50_ms": round(percentile(latencies, 50), 3),
+        "p95_ms": round(percentile(latencies, 95), 3),
+        "p99_ms": round(percentile(latencies, 99), 3),
+        "mean_ms": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        "queries_per_request": round(sum(queries for _, queries, _ in samples) / max(len(samples), 1), 2),
+    }
+    if elapsed:
+        summary["requests_per_s"] = round(len(samples) / elapsed, 1)
+    return summary
+
+
+def timed_request(client, method, url, clear_cache=False, **kwargs):
+    if clear_cache:
+        cache.clear()
+    start = time.perf_counter()
+    response = client.open(url, method=method, **kwargs)
+    seconds = time.perf_counter() - start
+    match = QUERIES.search(response.headers.get("Server-Timing", ""))
+    return seconds, int(match[1]) if match else 0, response.status_code < 400
+
+
+def auth(user_id, role):
+    token = create_access_token(identity=str(user_id), additional_claims={"role": role})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def listing_scenarios(client, ids, count):
+    scenarios = {}
+    for sort_by in SORTABLE_COLUMNS:
+        for order in ("asc", "desc"):
+            for name, filters in LISTING_FILTERS.items():
+                params = {"sort_by": sort_by, "order": order, "limit": "20"}
+                params.update({key: value or str(ids["sellers"][0]) for key, value in filters.items()})
+                samples = [timed_request(client, "GET", "/products/", True, query_string=params) for _ in range(count)]
+                scenarios[f"listing:{sort_by}:{order}:{name}"] = summarize(samples)
+    return scenarios
+
+
+def cart_scenarios(client, ids, in_stock, count, rnd):
+    adds, reads = [], []
+    for i in range(count):
+        headers = auth(ids["users"][i % len(ids["users"])], "user")
+        line = {"product_id": rnd.choice(in_stock), "quantity": 1}
+        adds.append(timed_request(client, "POST", "/cart/", json=line, headers=headers))
+        reads.append(timed_request(client, "GET", "/cart/", True, query_string={"expand": "product"}, headers=headers))
+    return {"cart:add": summarize(adds), "cart:read": summarize(reads)}
+
+
+def checkout_scenario(app, ids, in_stock, count, threads, seed):
+    samples, lock = [], threading.Lock()
+    buyers = ids["users"][:threads]
+    barrier = threading.Barrier(len(buyers) + 1)
+
+    def buyer(index, user_id):
+        client = app.test_client()
+        rnd = random.Random(seed + index)
+        with app.app_context():
+            headers = auth(user_id, "user")
+        client.delete("/cart/", headers=headers)
+        barrier.wait()
+        for _ in range(count // len(buyers)):
+            line = {"product_id": rnd.choice(in_stock), "quantity": 1}
+            sample = timed_request(client, "POST", "/cart/", json=line, headers=headers)
+            # A failed add leaves nothing to check out; record it as the error
+            if sample[2]:
+                sample = timed_request(client, "POST", "/orders/checkout", json={}, headers=headers)
+            with lock:
+                samples.append(sample)
+
+    workers = [threading.Thread(target=buyer, args=(i, user_id)) for i, user_id in enumerate(buyers)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return {f"checkout:{len(buyers)}_threads": summarize(samples, time.perf_counter() - start)}
+
+
+def order_history_scenario(client, ids, count):
+    samples = [
+        timed_request(client, "GET", "/orders/me", True, headers=auth(ids["users"][i % len(ids["users"])], "user"))
+        for i in range(count)
+    ]
+    return {"orders:history": summarize(samples)}
+
+
+def compare(results, baseline, threshold):
+    """Regressions of ``results`` against ``baseline``, as messages."""
+    failures = [
+        f"{name}: in the baseline but missing from this run"
+        for name in sorted(set(baseline.get("scenarios", {})) - set(results["scenarios"]))
+    ]
+    for name, current in sorted(results["scenarios"].items()):
+        base = baseline.get("scenarios", {}).get(name)
+        if base is None:
+            continue
+        if current["errors"] > base["errors"]:
+            failures.append(f"{name}: {current['errors']} errors vs baseline {base['errors']}")
+        if current["p95_ms"] > base["p95_ms"] * (1 + threshold):
+            failures.append(
+                f"{name}: p95 {current['p95_ms']:.2f} ms vs baseline {base['p95_ms']:.2f} ms "
+                f"(+{current['p95_ms'] / base['p95_ms'] - 1:.0%}, threshold {threshold:.0%})"
+            )
+        if current["queries_per_request"] > base["queries_per_request"]:
+            failures.append(
+                f"{name}: {current['queries_per_request']} queries per request vs baseline "
+                f"{base['queries_per_request']}"
+            )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--products", type=int, default=5000)
+    parser.add_argument("--orders", type=int, default=2000)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--listing-requests", type=int, default=20, help="requests per listing combination")
+    parser.add_argument("--threads", type=int, default=8, help="concurrent buyers in the checkout scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmarks/results.json")
+    parser.add_argument("--baseline", default="benchmarks/baseline.json")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p95 slowdown, 0.25 = 25%%")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    args = parser.parse_args()
+
+    app = make_app()
+    app.config.update(
+        INSTRUMENTATION_SAMPLE_RATE=1.0,
+        JWT_SECRET_KEY=app.config["JWT_SECRET_KEY"] or "bench-secret-key-of-sufficient-length",
+    )
+    # Keep per-request timing and checkout log lines out of the output
+    logging.getLogger("app").setLevel(logging.WARNING)
+    rnd = random.Random(args.seed)
+
+    with app.app_context():
+        db.create_all()
+        ids = seed_dataset(args.users, args.products, args.orders, seed=args.seed)
+        in_stock = [pid for pid, in db.session.execute(db.select(Product.id).where(Product.stock >= 100))]
+        client = app.test_client()
+
+        scenarios = {}
+        scenarios.update(listing_scenarios(client, ids, args.listing_requests))
+        scenarios.update(cart_scenarios(client, ids, in_stock, args.requests, rnd))
+        scenarios.update(order_history_scenario(client, ids, args.requests))
+        scenarios.update(checkout_scenario(app, ids, in_stock, args.requests, args.threads, args.seed))
+        dialect = db.engine.dialect.name
+
+    results = {
+        "meta": {
+            "dialect": dialect,
+            "python": platform.python_version(),
+            "args": {key: value for key, value in vars(args).items() if key not in ("output", "baseline", "save_baseline")},
+        },
+        "scenarios": scenarios,
+    }
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    print(f"{'scenario':<40} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'errors':>7}")
+    for name, s in scenarios.items():
+        print(f"{name:<40} {s['p50_ms']:>8.2f} {s['p95_ms']:>8.2f} {s['p99_ms']:>8.2f} "
+              f"{s['queries_per_request']:>8.2f} {s['errors']:>7}")
+    print(f"results written to {args.output}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"baseline saved to {args.baseline}")
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    with open(args.baseline) as f:
+        failures = compare(results, json.load(f), args.threshold)
+    for failure in failures:
+        print(f"REGRESSION {failure}")
+    print(f"{len(failures)} regressions against {args.baseline}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
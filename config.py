@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,3 +8,79 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY")
+
+    # Idempotency-Key handling for POST /orders/checkout (seconds)
+    IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 60 * 60))
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", 30))
+    IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", 10))
+
+    # Read-through cache for product and order reads. CACHE_BACKEND is one of
+    # memory (per process), sqlite (file shared by all workers on the host,
+    # CACHE_URL is the file path) or redis (CACHE_URL is the server URL)
+    CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+    CACHE_URL = os.getenv("CACHE_URL")
+    CACHE_MAXSIZE = int(os.getenv("CACHE_MAXSIZE", 1024))
+    CACHE_TTL = int(os.getenv("CACHE_TTL", 60))
+
+    # Product name autocomplete (GET /products/suggest). The index is built at
+    # startup; workers pick up other workers' writes after at most
+    # SUGGEST_REBUILD_INTERVAL seconds
+    SUGGEST_MAX_K = int(os.getenv("SUGGEST_MAX_K", 50))
+    SUGGEST_REBUILD_INTERVAL = int(os.getenv("SUGGEST_REBUILD_INTERVAL", 60))
+
+    # Upper bounds of the price facet buckets on GET /products/?facets=price;
+    # a final open-ended bucket covers everything above the last one
+    PRODUCT_PRICE_BUCKETS = [float(b) for b in os.getenv("PRODUCT_PRICE_BUCKETS", "10,25,50,100,250").split(",")]
+
+    # Largest array accepted by POST/PATCH/DELETE /products/bulk
+    PRODUCT_BULK_MAX_ITEMS = int(os.getenv("PRODUCT_BULK_MAX_ITEMS", 1000))
+
+    # Rows per INSERT/commit for `flask import-products` and POST /products/import
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", 1000))
+
+    # Largest array of lines accepted by POST /cart/
+    CART_MAX_BATCH_ITEMS = int(os.getenv("CART_MAX_BATCH_ITEMS", 100))
+
+    # Hold stock for cart lines (POST /cart/ fails with 409 once it runs out).
+    # Holds expire after STOCK_RESERVATION_TTL seconds; the sweeper thread runs
+    # every RESERVATION_SWEEP_INTERVAL seconds (0 = off, use
+    # `flask release-reservations` from cron instead)
+    STOCK_RESERVATIONS = os.getenv("STOCK_RESERVATIONS", "false").lower() == "true"
+    STOCK_RESERVATION_TTL = int(os.getenv("STOCK_RESERVATION_TTL", 15 * 60))
+    RESERVATION_SWEEP_INTERVAL = int(os.getenv("RESERVATION_SWEEP_INTERVAL", 0))
+    RESERVATION_SWEEP_BATCH = int(os.getenv("RESERVATION_SWEEP_BATCH", 500))
+
+    # Upper bound for a product's stock_shards. A product with stock_shards = N
+    # keeps its stock in N rows so concurrent checkouts don't all lock one row
+    STOCK_MAX_SHARDS = int(os.getenv("STOCK_MAX_SHARDS", 64))
+
+    # Share of requests (0..1) that get a Server-Timing header and a timing
+    # log line with their query count, DB, serialization and handler time
+    INSTRUMENTATION_SAMPLE_RATE = float(os.getenv("INSTRUMENTATION_SAMPLE_RATE", 0))
+
+    # GET /metrics: latency histogram bucket bounds (seconds). With several
+    # worker processes, point METRICS_MULTIPROC_DIR at a directory they share
+    # (emptied before start); each worker writes its totals there at most
+    # every METRICS_FLUSH_INTERVAL seconds
+    METRICS_BUCKETS = [float(b) for b in os.getenv(
+        "METRICS_BUCKETS", "0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10"
+    ).split(",")]
+    METRICS_MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+    METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 5))
+
+    # Logging goes through a queue to a background writer. LOG_FORMAT is json
+    # or text; LOG_LEVELS overrides single loggers, e.g.
+    # "app.services.order_service=DEBUG,sqlalchemy.engine=INFO"
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+    LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+    LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+
+    # Request profiling. Admins can always send X-Profile: pstats|collapsed;
+    # PROFILE_SAMPLE_EVERY = N also profiles every Nth request into
+    # PROFILE_DIR, keeping the newest PROFILE_KEEP files. Collapsed stacks are
+    # sampled every PROFILE_SAMPLE_INTERVAL seconds
+    PROFILE_SAMPLE_EVERY = int(os.getenv("PROFILE_SAMPLE_EVERY", 0))
+    PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "pstats")
+    PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join(tempfile.gettempdir(), "greenmarket-profiles"))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", 100))
+    PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", 0.005))
@@ -0,0 +1,37 @@
+"""add full-text search index on products (Postgres only)
+
+Revision ID: 3a8f61c0d2e9
+Revises: e1f7a3b95c42
+Create Date: 2026-10-18 14:02:55.116348
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a8f61c0d2e9'
+down_revision = 'e1f7a3b95c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Other databases search through the in-process index instead
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.create_index(
+        'ix_products_search',
+        'products',
+        [sa.text("to_tsvector('english', name || ' ' || coalesce(description, ''))")],
+        unique=False,
+        postgresql_using='gin',
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_products_search', table_name='products')
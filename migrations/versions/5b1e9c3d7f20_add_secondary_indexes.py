@@ -0,0 +1,49 @@
+"""add secondary indexes for product, cart and order access paths
+
+Revision ID: 5b1e9c3d7f20
+Revises: c76841cac9d6
+Create Date: 2026-10-18 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b1e9c3d7f20'
+down_revision = 'c76841cac9d6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Merge duplicate cart lines so the unique index can be built
+    op.execute(
+        "UPDATE cart_items SET quantity = ("
+        " SELECT SUM(COALESCE(c2.quantity, 1)) FROM cart_items c2"
+        " WHERE c2.user_id = cart_items.user_id AND c2.product_id = cart_items.product_id)"
+        " WHERE id IN ("
+        " SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id HAVING COUNT(*) > 1)"
+    )
+    op.execute(
+        "DELETE FROM cart_items WHERE id NOT IN ("
+        " SELECT MIN(id) FROM cart_items GROUP BY user_id, product_id)"
+    )
+
+    op.create_index('ix_products_seller_id_price', 'products', ['seller_id', 'price'], unique=False)
+    op.create_index('ix_products_price_id', 'products', ['price', 'id'], unique=False)
+    op.create_index('ix_products_stock', 'products', ['stock'], unique=False)
+    op.create_index('ux_cart_items_user_id_product_id', 'cart_items', ['user_id', 'product_id'], unique=True)
+    op.create_index('ix_orders_user_id_created_at', 'orders', ['user_id', sa.text('created_at DESC')], unique=False)
+    op.create_index('ix_order_items_order_id', 'order_items', ['order_id'], unique=False)
+    op.create_index('ix_transactions_order_id', 'transactions', ['order_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_transactions_order_id', table_name='transactions')
+    op.drop_index('ix_order_items_order_id', table_name='order_items')
+    op.drop_index('ix_orders_user_id_created_at', table_name='orders')
+    op.drop_index('ux_cart_items_user_id_product_id', table_name='cart_items')
+    op.drop_index('ix_products_stock', table_name='products')
+    op.drop_index('ix_products_price_id', table_name='products')
+    op.drop_index('ix_products_seller_id_price', table_name='products')
@@ -0,0 +1,38 @@
+"""add stock_reservations table
+
+Revision ID: b7e2d94c1a36
+Revises: 3a8f61c0d2e9
+Create Date: 2026-10-18 16:21:09.304417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d94c1a36'
+down_revision = '3a8f61c0d2e9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_reservations',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ux_stock_reservations_user_id_product_id', 'stock_reservations', ['user_id', 'product_id'], unique=True)
+    op.create_index('ix_stock_reservations_expires_at', 'stock_reservations', ['expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_stock_reservations_expires_at', table_name='stock_reservations')
+    op.drop_index('ux_stock_reservations_user_id_product_id', table_name='stock_reservations')
+    op.drop_table('stock_reservations')
@@ -0,0 +1,32 @@
+"""add version columns to products and orders
+
+Revision ID: e1f7a3b95c42
+Revises: 9d4c2a71e6b8
+Create Date: 2026-10-18 12:41:09.772103
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f7a3b95c42'
+down_revision = '9d4c2a71e6b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('version')
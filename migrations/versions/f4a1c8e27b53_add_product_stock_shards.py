@@ -0,0 +1,36 @@
+"""add sharded stock counters
+
+Revision ID: f4a1c8e27b53
+Revises: b7e2d94c1a36
+Create Date: 2026-10-18 17:48:31.820174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a1c8e27b53'
+down_revision = 'b7e2d94c1a36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('stock_shards', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('product_stock_shards',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('shard', sa.Integer(), nullable=False),
+    sa.Column('stock', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('product_id', 'shard')
+    )
+
+
+def downgrade():
+    op.drop_table('product_stock_shards')
+
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('stock_shards')
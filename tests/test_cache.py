@@ -0,0 +1,83 @@
+import multiprocessing
+import time
+from flask_jwt_extended import create_access_token
+from app.core.cache import Cache, SQLiteBackend, TTLCache
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_cache_stats_requires_admin(client, test_app):
+    with test_app.app_context():
+        user_token = create_access_token(identity="1", additional_claims={"role": "user"})
+        admin_token = create_access_token(identity="1", additional_claims={"role": "admin"})
+
+    res = client.get("/cache/stats", headers={"Authorization": f"Bearer {user_token}"})
+    assert res.status_code == 403
+
+    res = client.get("/cache/stats", headers={"Authorization": f"Bearer {admin_token}"})
+    assert res.status_code == 200
+    assert {"hits", "misses", "evictions", "size"} <= set(res.get_json())
+
+
+def _bump_in_child(path):
+    backend = SQLiteBackend(path)
+    backend.incr("gen:products")
+    backend.delete("product:1")
+
+
+def test_sqlite_backend_is_shared_across_processes(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = Cache()
+    cache.backend = SQLiteBackend(path, ttl=60)
+
+    cache.set("product:1", {"id": 1})
+    assert cache.get("product:1") == {"id": 1}
+    assert cache.generation("products") == 0
+
+    child = multiprocessing.get_context("spawn").Process(target=_bump_in_child, args=(path,))
+    child.start()
+    child.join(timeout=30)
+    assert child.exitcode == 0
+
+    assert cache.get("product:1") is None
+    assert cache.generation("products") == 1
+
+
+def test_sqlite_backend_expires_and_prunes(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "cache.sqlite3"), maxsize=5, ttl=60)
+    backend.PRUNE_EVERY = 1
+    backend.set("short", b"x", ttl=-1)
+    assert backend.get("short") is None
+
+    for i in range(10):
+        backend.set(f"k{i}", b"v")
+
+    stats = backend.stats()
+    assert stats["size"] == 5
+    assert stats["evictions"] >= 5
+    assert backend.get("k9") == b"v"
@@ -1,6 +1,7 @@
 from flask_jwt_extended import create_access_token
+from sqlalchemy import event
 from app import db
-from app.models.models import User, Product
+from app.models.models import CartItem, User, Product
 
 def get_auth_header_for_user(app, username="cartuser"):
     with app.app_context():
@@ -121,4 +122,88 @@ def test_clear_cart(client, test_app):
     # Ensure cart is empty
     res_get = client.get("/cart/", headers=headers)
     assert res_get.status_code == 200
-    assert res_get.get_json() == []
\ No newline at end of file
+    assert res_get.get_json() == []
+
+def test_add_to_cart_upserts_in_one_statement(client, test_app):
+    _, product_id, headers = get_auth_header_for_user(test_app)
+    first = client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=headers).get_json()
+
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        second = client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=headers).get_json()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert len(statements) == 1
+    assert "ON CONFLICT" in statements[0]
+    assert second["item_id"] == first["item_id"]
+    assert CartItem.query.count() == 1
+    assert CartItem.query.first().quantity == 5
+
+
+def test_add_to_cart_accepts_array(client, test_app):
+    _, product_id, headers = get_auth_header_for_user(test_app)
+    with test_app.app_context():
+        other = Product(name="Other", price=1.0, stock=10, seller_id=1)
+        db.session.add(other)
+        db.session.commit()
+        other_id = other.id
+
+    res = client.post("/cart/", json=[
+        {"product_id": other_id, "quantity": 2},
+        {"product_id": product_id},
+        {"product_id": other_id, "quantity": 1},
+    ], headers=headers)
+    assert res.status_code == 201
+    items = res.get_json()["items"]
+    assert [(i["product_id"], i["quantity"]) for i in items] == [(other_id, 3), (product_id, 1)]
+    assert sorted(i["item_id"] for i in items) == [item.id for item in CartItem.query.order_by(CartItem.id)]
+
+    # An unknown product rejects the whole request
+    res = client.post("/cart/", json=[{"product_id": product_id}, {"product_id": 999}], headers=headers)
+    assert res.status_code == 404
+    assert CartItem.query.filter_by(product_id=product_id).first().quantity == 1
+
+    assert client.post("/cart/", json=[{"product_id": product_id, "quantity": 0}], headers=headers).status_code == 400
+    assert client.post("/cart/", json=[], headers=headers).status_code == 400
+
+
+def test_get_cart_expanded_in_one_query(client, test_app):
+    _, product_id, headers = get_auth_header_for_user(test_app)
+    with test_app.app_context():
+        scarce = Product(name="Scarce", price=2.5, stock=1, seller_id=1)
+        db.session.add(scarce)
+        db.session.commit()
+        scarce_id = scarce.id
+
+    client.post("/cart/", json=[{"product_id": product_id, "quantity": 2}, {"product_id": scarce_id, "quantity": 3}],
+                headers=headers)
+
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        res = client.get("/cart/?expand=product", headers=headers)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert res.status_code == 200
+    assert len(statements) == 1
+    body = res.get_json()
+    assert [(i["name"], i["price"], i["quantity"], i["line_total"], i["available"]) for i in body["items"]] == [
+        ("Test Product", 9.99, 2, 19.98, True),
+        ("Scarce", 2.5, 3, 7.5, False),
+    ]
+    assert body["subtotal"] == 19.98 + 7.5
+    assert body["item_count"] == 5
+    assert body["available"] is False
+
+    assert client.get("/cart/?expand=seller", headers=headers).status_code == 400
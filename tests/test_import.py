@@ -0,0 +1,100 @@
+import io
+import json
+import tracemalloc
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.models import Product, User
+from app.services.import_service import import_products, iter_rows
+
+
+@pytest.fixture
+def seller(test_app):
+    user = User(username="importer", email="importer@mail.com", password="hashed", role="seller")
+    db.session.add(user)
+    db.session.commit()
+    token = create_access_token(identity=str(user.id), additional_claims={"role": "seller"})
+    return user.id, {"Authorization": f"Bearer {token}"}
+
+
+def csv_feed(count, bad_every=0):
+    yield "name,description,price,stock,image_url,supplier_sku\n"
+    for i in range(count):
+        price = "n/a" if bad_every and i % bad_every == 0 else f"{1 + i % 50}.5"
+        yield f"Item {i},Feed item,{price},{i % 7},,SKU{i}\n"
+
+
+def test_cli_imports_csv_in_batches(test_app, seller, tmp_path):
+    seller_id, _ = seller
+    path = tmp_path / "feed.csv"
+    path.write_text("".join(csv_feed(25, bad_every=10)))
+
+    result = test_app.test_cli_runner().invoke(
+        args=["import-products", str(path), "--seller-id", str(seller_id), "--batch-size", "10"]
+    )
+    assert result.exit_code == 0, result.output
+    assert result.output.count("rows read") == 3  # 22 good rows in batches of 10
+    assert "22 of 25 rows imported, 3 errors" in result.output
+    assert "line 2: {'price': 'Invalid value'}" in result.output
+
+    assert Product.query.count() == 22
+    product = Product.query.filter_by(name="Item 1").one()
+    assert (product.price, product.stock, product.seller_id, product.description) == (2.5, 1, seller_id, "Feed item")
+
+
+def test_cli_rejects_unknown_seller(test_app, tmp_path):
+    path = tmp_path / "feed.csv"
+    path.write_text("".join(csv_feed(1)))
+    result = test_app.test_cli_runner().invoke(args=["import-products", str(path), "--seller-id", "999"])
+    assert result.exit_code != 0
+    assert "No user with id 999" in result.output
+
+
+def test_upload_ndjson(client, seller):
+    _, headers = seller
+    lines = [
+        json.dumps({"name": "Jar", "price": 3, "stock": 2}),
+        "",
+        "{broken",
+        json.dumps({"name": "Lid", "price": -1, "stock": 2}),
+        json.dumps(["not", "an", "object"]),
+        json.dumps({"name": "Cap", "price": 1.25, "stock": 0, "image_url": "http://x/cap.jpg"}),
+    ]
+    res = client.post(
+        "/products/import", data="\n".join(lines), headers={**headers, "Content-Type": "application/x-ndjson"}
+    )
+    assert res.status_code == 200
+    report = res.get_json()
+    assert (report["rows"], report["imported"], report["errors"]) == (5, 2, 3)
+    assert [d["line"] for d in report["error_details"]] == [3, 4, 5]
+
+    names = [p["name"] for p in client.get("/products/").get_json()]
+    assert names == ["Jar", "Cap"]
+    assert [p["name"] for p in client.get("/products/search?q=cap").get_json()] == ["Cap"]
+
+
+def test_upload_multipart_csv(client, seller):
+    _, headers = seller
+    data = {"file": (io.BytesIO("".join(csv_feed(5)).encode()), "feed.csv")}
+    res = client.post("/products/import", data=data, headers=headers, content_type="multipart/form-data")
+    assert res.status_code == 200
+    assert res.get_json()["imported"] == 5
+
+    res = client.post("/products/import", data="x", headers=headers)
+    assert res.status_code == 400
+
+
+def test_import_memory_does_not_grow_with_feed_size(test_app, seller):
+    seller_id, _ = seller
+
+    def peak(count):
+        feed = io.StringIO("".join(csv_feed(count)))
+        tracemalloc.start()
+        import_products(iter_rows(feed, "csv"), seller_id, batch_size=500)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return peak
+
+    small, large = peak(1000), peak(10000)
+    assert Product.query.count() == 11000
+    assert large < small * 2
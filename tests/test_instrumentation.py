@@ -0,0 +1,38 @@
+import logging
+import re
+from app import db
+from app.models.models import Product, User
+
+
+def seed_products():
+    seller = User(username="seller", email="seller@mail.com", password="x", role="seller")
+    db.session.add(seller)
+    db.session.commit()
+    db.session.add_all([Product(name=f"Item {i}", price=1.0, stock=1, seller_id=seller.id) for i in range(3)])
+    db.session.commit()
+
+
+def test_sampled_request_reports_server_timing(client, test_app, caplog):
+    test_app.config["INSTRUMENTATION_SAMPLE_RATE"] = 1.0
+    seed_products()
+
+    with caplog.at_level(logging.INFO, logger="app.core.instrumentation"):
+        res = client.get("/products/?include_total=true")
+
+    header = res.headers["Server-Timing"]
+    match = re.search(r'db;dur=([\d.]+);desc="(\d+) queries", serialize;dur=([\d.]+), handler;dur=([\d.]+)', header)
+    assert match
+    db_ms, queries, serialize_ms, handler_ms = float(match[1]), int(match[2]), float(match[3]), float(match[4])
+    assert queries >= 2
+    assert db_ms + serialize_ms <= handler_ms
+
+    [record] = [r for r in caplog.records if r.name == "app.core.instrumentation"]
+    assert record.timing["endpoint"] == "products.list_products"
+    assert record.timing["status"] == 200
+    assert record.timing["queries"] == queries
+    assert "path=/products/" in record.getMessage()
+
+
+def test_unsampled_requests_are_untouched(client, test_app):
+    test_app.config["INSTRUMENTATION_SAMPLE_RATE"] = 0
+    assert "Server-Timing" not in client.get("/products/").headers
@@ -0,0 +1,70 @@
+import io
+import json
+import logging
+from flask import g
+from app.core import log
+from app.core.log import JSONFormatter, _parse_levels, stop_logging
+
+
+def test_request_id_is_echoed_or_generated(client):
+    assert client.get("/", headers={"X-Request-ID": "abc-123"}).headers["X-Request-ID"] == "abc-123"
+    generated = client.get("/").headers["X-Request-ID"]
+    assert len(generated) == 32
+    assert client.get("/", headers={"X-Request-ID": "x" * 500}).headers["X-Request-ID"] != "x" * 500
+
+
+def test_records_are_written_as_json_through_the_queue(test_app):
+    output = io.StringIO()
+    log._listener.handlers[0].setStream(output)
+    logger = logging.getLogger("app.services.order_service")
+    with test_app.test_request_context("/orders/checkout"):
+        g.request_id = "req-1"
+        logger.info("Checkout complete", extra={"order_id": 7})
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Checkout failed for %s", "user 3")
+    stop_logging()  # drains the queue
+
+    lines = [json.loads(line) for line in output.getvalue().splitlines()]
+    complete, failed = [line for line in lines if line["logger"] == "app.services.order_service"]
+    assert complete["msg"] == "Checkout complete"
+    assert complete["order_id"] == 7
+    assert complete["request_id"] == "req-1"
+    assert complete["level"] == "INFO"
+    assert failed["msg"] == "Checkout failed for user 3"
+    assert "ValueError: boom" in failed["exc"]
+
+
+def test_json_formatter_outside_a_request():
+    record = logging.LogRecord("app.cli", logging.WARNING, __file__, 1, "%d rows", (3,), None)
+    entry = json.loads(JSONFormatter().format(record))
+    assert entry["msg"] == "3 rows"
+    assert entry["request_id"] == "-"
+
+
+def test_per_module_levels_are_parsed():
+    assert _parse_levels("app.services=debug, sqlalchemy.engine=INFO,") == {
+        "app.services": "DEBUG",
+        "sqlalchemy.engine": "INFO",
+    }
+
+
+def test_verification_token_is_not_logged(client, caplog):
+    with caplog.at_level(logging.INFO, logger="app.services.auth_services"):
+        res = client.post("/auth/register", json={
+            "username": "logcheck", "email": "logcheck@mail.com", "password": "secret123"
+        })
+    assert res.status_code == 201
+    assert "Mock verification email sent to user" in caplog.text
+    assert "token" not in caplog.text
+
+
+def test_verification_link_goes_to_the_debug_mail_logger(client, caplog):
+    with caplog.at_level(logging.DEBUG, logger="app.mail"):
+        client.post("/auth/register", json={
+            "username": "mailcheck", "email": "mailcheck@mail.com", "password": "secret123"
+        })
+    link = next(r for r in caplog.records if r.name == "app.mail")
+    assert link.levelno == logging.DEBUG
+    assert "/verify-email?token=" in link.getMessage()
@@ -0,0 +1,94 @@
+import json
+import os
+import threading
+from sqlalchemy import create_engine
+from sqlalchemy.pool import QueuePool
+from app.core.metrics import Metrics, pool_gauges
+
+
+def sample(text, name):
+    return {line.rsplit(" ", 1)[0]: float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(name)}
+
+
+def test_metrics_endpoint_counts_requests_per_route_and_status(client):
+    client.get("/products/")
+    client.get("/products/")
+    client.get("/products/999999")
+    client.get("/no-such-page")
+
+    res = client.get("/metrics")
+    assert res.status_code == 200
+    assert res.content_type.startswith("text/plain; version=0.0.4")
+    text = res.get_data(as_text=True)
+
+    counts = sample(text, "http_requests_total{")
+    assert counts['http_requests_total{endpoint="products.list_products",method="GET",status="200"}'] == 2
+    assert counts['http_requests_total{endpoint="products.detail",method="GET",status="404"}'] == 1
+    assert counts['http_requests_total{endpoint="unmatched",method="GET",status="404"}'] == 1
+
+    labels = 'endpoint="products.list_products",method="GET",status="200"'
+    buckets = sample(text, f"http_request_duration_seconds_bucket{{{labels}")
+    assert buckets[f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}}'] == 2
+    assert list(buckets.values()) == sorted(buckets.values())
+    assert sample(text, "http_request_duration_seconds_count")[f"http_request_duration_seconds_count{{{labels}}}"] == 2
+
+
+def test_multiprocess_mode_adds_up_worker_files(tmp_path):
+    metrics = Metrics([0.1, 1], directory=str(tmp_path), gauges=lambda: {"db_pool_checked_out": 2})
+    metrics.observe("cart.view_cart", "GET", 200, 0.05)
+    metrics.observe("cart.view_cart", "GET", 200, 0.5)
+
+    # A worker that has since exited: its counts stay, its gauges don't
+    (tmp_path / "metrics-999999999.json").write_text(json.dumps({
+        "pid": 999999999,
+        "buckets": [0.1, 1],
+        "requests": [[["cart.view_cart", "GET", "200"], 3]],
+        "durations": [[["cart.view_cart", "GET", "200"], [1, 1, 1, 4.2]]],
+        "gauges": {"db_pool_checked_out": 7},
+    }))
+
+    text = metrics.render()
+    labels = 'endpoint="cart.view_cart",method="GET",status="200"'
+    assert f"http_requests_total{{{labels}}} 5" in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="0.1"}} 2' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="1.0"}} 4' in text
+    assert f'http_request_duration_seconds_bucket{{{labels},le="+Inf"}} 5' in text
+    assert "db_pool_checked_out 2" in text
+    assert (tmp_path / f"metrics-{os.getpid()}.json").exists()
+
+
+def test_pool_gauges_read_queue_pool():
+    engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=3)
+    with engine.connect():
+        gauges = pool_gauges(engine)
+    assert gauges["db_pool_size"] == 3
+    assert gauges["db_pool_checked_out"] == 1
+
+
+def test_concurrent_flushes_do_not_clash(tmp_path):
+    metrics = Metrics([0.1], directory=str(tmp_path), flush_interval=0)
+    errors = []
+
+    def worker():
+        try:
+            for _ in range(200):
+                metrics.observe("main.index", "GET", 200, 0.01)
+                metrics.maybe_flush()
+        except OSError as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert 'http_requests_total{endpoint="main.index",method="GET",status="200"} 1600' in metrics.render()
+    assert os.listdir(tmp_path) == [f"metrics-{os.getpid()}.json"]
+
+
+def test_flush_errors_do_not_fail_requests(client, test_app, tmp_path):
+    metrics = test_app.extensions["metrics"]
+    metrics.directory, metrics.flush_interval = str(tmp_path / "missing"), 0
+    assert client.get("/").status_code == 200
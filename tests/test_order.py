@@ -1,6 +1,12 @@
+import csv
+import io
 import json  # Add this import for JSON serialization
+from datetime import datetime, timedelta
 from flask_jwt_extended import create_access_token
-from app.models.models import User, Product, CartItem, db, Transaction
+from sqlalchemy import event
+from app.models.models import User, Product, CartItem, Order, OrderItem, db, Transaction, IdempotencyKey
+from app.services.idempotency_service import _request_hash
+from app.services.order_service import invalidate_orders
 
 def setup_user_cart(test_app):
     with test_app.app_context():
@@ -163,3 +169,261 @@ def test_transactions_created_on_checkout(client, test_app):
         assert tx.method == "credit_card"
         assert tx.status == "pending"
         assert tx.amount == product_price * 2  # use captured price
+
+
+def count_queries(call):
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        response = call()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+    return response, len(statements)
+
+
+def seed_orders(test_app, user_id, count):
+    with test_app.app_context():
+        product = Product.query.first()
+        for _ in range(count):
+            order = Order(user_id=user_id, total_amount=20.0, status="pending")
+            order.order_items = [
+                OrderItem(product_id=product.id, quantity=1, unit_price=10.0),
+                OrderItem(product_id=product.id, quantity=1, unit_price=10.0),
+            ]
+            db.session.add(order)
+        db.session.commit()
+        invalidate_orders(user_id)
+
+
+def test_order_history_query_count_is_constant(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    with test_app.app_context():
+        user_id = User.query.filter_by(username="tester").first().id
+
+    seed_orders(test_app, user_id, 1)
+    res, few = count_queries(lambda: client.get("/orders/me", headers=headers))
+    assert len(res.get_json()) == 1
+
+    seed_orders(test_app, user_id, 25)
+    res, many = count_queries(lambda: client.get("/orders/me", headers=headers))
+    assert len(res.get_json()) == 26
+    assert all(len(order["items"]) == 2 for order in res.get_json())
+
+    # ETag key scan, orders, and one batched load of their items
+    assert few == many == 3
+
+
+def test_order_detail_query_count(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    with test_app.app_context():
+        user_id = User.query.filter_by(username="tester").first().id
+    seed_orders(test_app, user_id, 1)
+
+    res, queries = count_queries(lambda: client.get("/orders/1", headers=headers))
+    assert res.status_code == 200
+    assert len(res.get_json()["items"]) == 2
+    assert queries == 2
+
+
+def test_checkout_insufficient_stock_leaves_no_order(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    with test_app.app_context():
+        CartItem.query.first().quantity = 50
+        db.session.commit()
+
+    res = client.post("/orders/checkout", json={}, headers=headers)
+    assert res.status_code == 400
+    assert "Not enough stock" in res.get_json()["msg"]
+
+    with test_app.app_context():
+        assert Order.query.count() == 0
+        assert Transaction.query.count() == 0
+        assert Product.query.first().stock == 5
+        assert CartItem.query.count() == 1
+
+
+def test_checkout_query_count_independent_of_cart_size(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    with test_app.app_context():
+        user_id = User.query.filter_by(username="tester").first().id
+
+    res, small = count_queries(lambda: client.post("/orders/checkout", json={}, headers=headers))
+    assert res.status_code == 201
+
+    with test_app.app_context():
+        for i in range(10):
+            p = Product(name=f"Bulk {i}", price=1.0 + i, stock=10, seller_id=user_id)
+            db.session.add(p)
+            db.session.flush()
+            db.session.add(CartItem(user_id=user_id, product_id=p.id, quantity=3))
+        db.session.commit()
+
+    res, large = count_queries(lambda: client.post("/orders/checkout", json={}, headers=headers))
+    assert res.status_code == 201
+    assert small == large
+
+    with test_app.app_context():
+        stocks = [p.stock for p in Product.query.filter(Product.name.like("Bulk %")).all()]
+        assert stocks == [7] * 10
+        order = db.session.get(Order, res.get_json()["order_id"])
+        assert len(order.order_items) == 10
+        assert order.total_amount == sum((1.0 + i) * 3 for i in range(10))
+
+
+def test_checkout_idempotency_key_replays_response(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    headers = {**headers, "Idempotency-Key": "retry-1"}
+
+    first = client.post("/orders/checkout", json={"payment_method": "credit_card"}, headers=headers)
+    second = client.post("/orders/checkout", json={"payment_method": "credit_card"}, headers=headers)
+
+    assert first.status_code == second.status_code == 201
+    assert first.get_json() == second.get_json()
+    assert second.headers.get("Idempotent-Replayed") == "true"
+
+    with test_app.app_context():
+        assert Order.query.count() == 1
+        assert Transaction.query.count() == 1
+
+
+def test_checkout_idempotency_key_rejects_different_payload(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    headers = {**headers, "Idempotency-Key": "retry-2"}
+
+    client.post("/orders/checkout", json={"payment_method": "credit_card"}, headers=headers)
+    res = client.post("/orders/checkout", json={"payment_method": "bank_transfer"}, headers=headers)
+
+    assert res.status_code == 422
+
+
+def test_checkout_idempotency_key_in_flight(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    test_app.config["IDEMPOTENCY_WAIT_TIMEOUT"] = 0.1
+
+    with test_app.app_context():
+        user_id = User.query.filter_by(username="tester").first().id
+        db.session.add(IdempotencyKey(
+            user_id=user_id, key="busy", request_hash=_request_hash({}),
+            status="in_progress", expires_at=datetime.utcnow() + timedelta(seconds=30)
+        ))
+        db.session.commit()
+
+    res = client.post("/orders/checkout", json={}, headers={**headers, "Idempotency-Key": "busy"})
+    assert res.status_code == 409
+
+    # A lock left behind by a crashed worker is taken over once it expires
+    with test_app.app_context():
+        record = IdempotencyKey.query.filter_by(key="busy").first()
+        record.expires_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+
+    res = client.post("/orders/checkout", json={}, headers={**headers, "Idempotency-Key": "busy"})
+    assert res.status_code == 201
+
+
+def test_order_reads_reflect_status_updates(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    order_id = client.post("/orders/checkout", json={}, headers=headers).get_json()["order_id"]
+
+    assert client.get(f"/orders/{order_id}", headers=headers).get_json()["status"] == "pending"
+    assert client.get("/orders/me", headers=headers).get_json()[0]["status"] == "pending"
+
+    with test_app.app_context():
+        admin_token = create_access_token(identity="1", additional_claims={"role": "admin"})
+    client.patch(f"/orders/{order_id}", json={"status": "shipped"},
+                 headers={"Authorization": f"Bearer {admin_token}"})
+
+    assert client.get(f"/orders/{order_id}", headers=headers).get_json()["status"] == "shipped"
+    assert client.get("/orders/me", headers=headers).get_json()[0]["status"] == "shipped"
+
+
+def test_order_history_conditional_get(client, test_app):
+    user, product, headers = setup_user_cart(test_app)
+    client.post("/orders/checkout", json={}, headers=headers)
+
+    res = client.get("/orders/me", headers=headers)
+    etag = res.headers["ETag"]
+
+    res = client.get("/orders/me", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 304
+    assert res.data == b""
+
+    with test_app.app_context():
+        admin_token = create_access_token(identity="1", additional_claims={"role": "admin"})
+    order_id = client.get("/orders/me", headers=headers).get_json()[0]["id"]
+    client.patch(f"/orders/{order_id}", json={"status": "paid"},
+                 headers={"Authorization": f"Bearer {admin_token}"})
+
+    res = client.get("/orders/me", headers={**headers, "If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.headers["ETag"] != etag
+
+
+def export_fixture(test_app):
+    """Two sellers with one product each, and two orders mixing their products."""
+    with test_app.app_context():
+        users = {}
+        for name, role in (("admin", "admin"), ("seller_a", "seller"), ("seller_b", "seller"), ("buyer", "user")):
+            users[name] = User(username=name, email=f"{name}@mail.com", password="x", role=role)
+            db.session.add(users[name])
+        db.session.commit()
+
+        apple = Product(name="Apple", price=1.0, stock=100, seller_id=users["seller_a"].id)
+        pear = Product(name="Pear", price=2.0, stock=100, seller_id=users["seller_b"].id)
+        db.session.add_all([apple, pear])
+        db.session.commit()
+
+        for created_at, lines in ((datetime(2024, 1, 5), [(apple, 2), (pear, 1)]), (datetime(2024, 3, 1), [(pear, 4)])):
+            order = Order(user_id=users["buyer"].id, total_amount=sum(p.price * q for p, q in lines),
+                          status="paid", created_at=created_at)
+            order.order_items = [OrderItem(product_id=p.id, quantity=q, unit_price=p.price) for p, q in lines]
+            db.session.add(order)
+            db.session.flush()
+            db.session.add(Transaction(order_id=order.id, method="card", amount=order.total_amount, status="paid"))
+        db.session.commit()
+
+        return {
+            name: {"Authorization": "Bearer " + create_access_token(
+                identity=str(user.id), additional_claims={"role": user.role})}
+            for name, user in users.items()
+        }
+
+
+def test_order_export_csv_streams_rows_per_role(client, test_app):
+    headers = export_fixture(test_app)
+
+    res = client.get("/orders/export?format=csv", headers=headers["admin"])
+    assert res.status_code == 200
+    assert res.is_streamed
+    assert res.mimetype == "text/csv"
+    assert "attachment" in res.headers["Content-Disposition"]
+    rows = list(csv.DictReader(io.StringIO(res.get_data(as_text=True))))
+    assert [(r["product_id"], r["quantity"]) for r in rows] == [("1", "2"), ("2", "1"), ("2", "4")]
+    assert rows[0]["payment_method"] == "card"
+    assert (rows[0]["order_total"], rows[0]["line_total"]) == ("4.0", "2.0")
+    assert rows[0]["created_at"] == "2024-01-05T00:00:00"
+
+    res = client.get("/orders/export?format=csv", headers=headers["seller_a"])
+    rows = list(csv.DictReader(io.StringIO(res.get_data(as_text=True))))
+    assert [(r["product_id"], r["line_total"]) for r in rows] == [("1", "2.0")]
+    # The order also holds seller_b's pear; its totals are not seller_a's to see
+    assert "order_total" not in rows[0] and "payment_amount" not in rows[0]
+
+    assert client.get("/orders/export", headers=headers["buyer"]).status_code == 403
+
+
+def test_order_export_ndjson_since(client, test_app):
+    headers = export_fixture(test_app)
+
+    res = client.get("/orders/export?format=ndjson&since=2024-02-01", headers=headers["seller_b"])
+    assert res.status_code == 200
+    rows = [json.loads(line) for line in res.get_data(as_text=True).splitlines()]
+    assert [(r["product_id"], r["quantity"], r["line_total"]) for r in rows] == [(2, 4, 8.0)]
+    assert "order_total" not in rows[0] and "payment_amount" not in rows[0]
+
+    assert client.get("/orders/export?since=yesterday", headers=headers["admin"]).status_code == 400
+    assert client.get("/orders/export?format=xml", headers=headers["admin"]).status_code == 400
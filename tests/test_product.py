@@ -1,7 +1,10 @@
 import pytest
 from flask_jwt_extended import create_access_token
-from app import db
-from app.models.models import User
+from sqlalchemy import event, update
+from app import cache, db
+from app.models.models import Product, User
+from app.models.serializers import product_serializer
+from app.services.product_services import get_all_products, get_product_rows
 
 @pytest.fixture
 def auth_headers(test_app):
@@ -138,3 +141,235 @@ def test_product_sorting(client):
     res = client.get("/products/?sort_by=price&order=desc")
     prices = [p["price"] for p in res.get_json()]
     assert prices == sorted(prices, reverse=True)
+
+
+def test_product_cursor_pagination(client, auth_headers):
+    # Repeated prices make sure ties are broken by id
+    for i in range(1, 13):
+        client.post("/products/", json={
+            "name": f"Cursor Product {i}",
+            "price": i % 4,
+            "stock": i
+        }, headers=auth_headers)
+
+    seen = []
+    url = "/products/?sort_by=price&order=desc&limit=5&cursor="
+    while True:
+        res = client.get(url)
+        assert res.status_code == 200
+        body = res.get_json()
+        assert len(body["items"]) <= 5
+        seen.extend(body["items"])
+        if not body["next_cursor"]:
+            break
+        url = f"/products/?sort_by=price&order=desc&limit=5&cursor={body['next_cursor']}"
+
+    assert len(seen) == 12
+    assert [(p["price"], p["id"]) for p in seen] == sorted(
+        [(p["price"], p["id"]) for p in seen], reverse=True
+    )
+
+
+def test_product_cursor_skips_count_unless_requested(client, test_app, auth_headers):
+    for i in range(3):
+        client.post("/products/", json={"name": f"P{i}", "price": i, "stock": 1}, headers=auth_headers)
+
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        statements.append(statement.lower())
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        res = client.get("/products/?cursor=&limit=2")
+        assert "total" not in res.get_json()
+        assert not any("count(" in s for s in statements)
+
+        res = client.get("/products/?cursor=&limit=2&include_total=true")
+        assert res.get_json()["total"] == 3
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def test_product_cursor_rejects_foreign_cursor(client, auth_headers):
+    for i in range(3):
+        client.post("/products/", json={"name": f"P{i}", "price": i, "stock": 1}, headers=auth_headers)
+
+    cursor = client.get("/products/?cursor=&limit=1&sort_by=price").get_json()["next_cursor"]
+
+    assert client.get(f"/products/?cursor={cursor}&sort_by=name").status_code == 400
+    assert client.get("/products/?cursor=not-a-cursor").status_code == 400
+
+
+def test_product_reads_are_cached_and_invalidated(client, test_app, auth_headers):
+    product_id = client.post("/products/", json={
+        "name": "Cached Product", "price": 5.0, "stock": 3
+    }, headers=auth_headers).get_json()["id"]
+
+    assert client.get(f"/products/{product_id}").get_json()["price"] == 5.0
+    assert client.get("/products/?limit=5").get_json()[0]["price"] == 5.0
+    hits = cache.stats()["hits"]
+
+    client.get(f"/products/{product_id}")
+    client.get("/products/?limit=5&page=1")  # same normalized filters
+    assert cache.stats()["hits"] == hits + 4  # ETag and body for each
+
+    client.put(f"/products/{product_id}", json={"price": 7.5}, headers=auth_headers)
+
+    assert client.get(f"/products/{product_id}").get_json()["price"] == 7.5
+    assert client.get("/products/?limit=5").get_json()[0]["price"] == 7.5
+
+
+def test_listing_ignores_empty_filters_and_rejects_bad_ones(client, auth_headers):
+    client.post("/products/", json={"name": "Plain", "price": 5.0, "stock": 3}, headers=auth_headers)
+
+    for query in ("seller_id=", "min_price=", "max_price=", "page=&limit="):
+        res = client.get(f"/products/?{query}")
+        assert res.status_code == 200, query
+        assert len(res.get_json()) == 1
+    for query in ("seller_id=abc", "min_price=cheap", "page=two"):
+        assert client.get(f"/products/?{query}").status_code == 400, query
+
+
+def test_product_conditional_get(client, auth_headers):
+    product_id = client.post("/products/", json={
+        "name": "Etag Product", "price": 5.0, "stock": 3
+    }, headers=auth_headers).get_json()["id"]
+
+    for url in (f"/products/{product_id}", "/products/?limit=5", "/products/?cursor=&limit=5"):
+        etag = client.get(url).headers["ETag"]
+
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 304, url
+        assert res.data == b""
+
+    etags = {url: client.get(url).headers["ETag"] for url in (f"/products/{product_id}", "/products/?limit=5")}
+    client.put(f"/products/{product_id}", json={"stock": 2}, headers=auth_headers)
+
+    for url, etag in etags.items():
+        res = client.get(url, headers={"If-None-Match": etag})
+        assert res.status_code == 200, url
+        assert res.get_json()
+
+
+def test_listing_projection_matches_orm_path(client, test_app, auth_headers):
+    for i in range(6):
+        client.post("/products/", json={"name": f"Row {i}", "price": 6 - i, "stock": i}, headers=auth_headers)
+
+    for filters in ({"limit": "4"}, {"sort_by": "created_at", "order": "desc", "cursor": ""}, {"in_stock": "true"}):
+        rows, _, _ = get_product_rows(filters)
+        assert product_serializer.many(rows) == [
+            product_serializer.from_object(p) for p in get_all_products(filters)
+        ]
+
+
+def test_product_facets_in_one_query(client, auth_headers):
+    for i, (price, stock) in enumerate([(5, 1), (12, 0), (30, 4), (30, 0), (400, 2)]):
+        client.post("/products/", json={"name": f"F{i}", "price": price, "stock": stock}, headers=auth_headers)
+
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        body = client.get("/products/?facets=price,seller,in_stock&limit=2").get_json()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    assert len(body["items"]) == 2
+    facets = body["facets"]
+    assert facets["price"] == {"0-10": 1, "10-25": 1, "25-50": 2, "50-100": 0, "100-250": 0, "250+": 1}
+    assert list(facets["seller"].values()) == [5]
+    assert facets["in_stock"] == {"true": 3, "false": 2}
+    # ETag window, page rows and one query for all facets
+    assert len(statements) == 3
+
+
+def test_product_facets_follow_filters_and_writes(client, auth_headers):
+    ids = [
+        client.post("/products/", json={"name": f"F{i}", "price": 20, "stock": i}, headers=auth_headers).get_json()["id"]
+        for i in range(3)
+    ]
+
+    body = client.get("/products/?facets=in_stock&min_price=15&cursor=").get_json()
+    assert body["facets"] == {"in_stock": {"true": 2, "false": 1}}
+    assert "next_cursor" in body
+
+    etag = client.get("/products/?facets=in_stock&limit=1").headers["ETag"]
+    client.put(f"/products/{ids[0]}", json={"stock": 9}, headers=auth_headers)
+    res = client.get("/products/?facets=in_stock&limit=1", headers={"If-None-Match": etag})
+    assert res.status_code == 200
+    assert res.get_json()["facets"]["in_stock"] == {"true": 3, "false": 0}
+
+    assert client.get("/products/?facets=color").status_code == 400
+
+
+def test_bulk_create_update_delete(client, test_app, auth_headers):
+    items = [{"name": f"Bulk {i}", "price": 1.5 + i, "stock": i} for i in range(5)]
+    res = client.post("/products/bulk", json=items, headers=auth_headers)
+    assert res.status_code == 201
+    results = res.get_json()["results"]
+    ids = [r["id"] for r in results]
+    assert [r["index"] for r in results] == list(range(5))
+    assert [client.get(f"/products/{pid}").get_json()["name"] for pid in ids] == [i["name"] for i in items]
+
+    etag = client.get(f"/products/{ids[0]}").headers["ETag"]
+    res = client.patch("/products/bulk", json=[
+        {"id": ids[0], "price": 9.0},
+        {"id": ids[1], "price": 8.0},
+        {"id": ids[2], "name": "Renamed", "stock": 40},
+    ], headers=auth_headers)
+    assert res.status_code == 200
+    assert client.get(f"/products/{ids[0]}", headers={"If-None-Match": etag}).status_code == 200
+    assert db.session.get(Product, ids[0]).version == 2
+    renamed = client.get(f"/products/{ids[2]}").get_json()
+    assert (renamed["name"], renamed["price"], renamed["stock"]) == ("Renamed", 3.5, 40)
+
+    res = client.delete("/products/bulk", json={"ids": ids[:2]}, headers=auth_headers)
+    assert res.status_code == 200
+    assert client.get(f"/products/{ids[0]}").status_code == 404
+    assert Product.query.count() == 3
+
+
+def test_bulk_validates_everything_before_writing(client, test_app, auth_headers):
+    res = client.post("/products/bulk", json=[
+        {"name": "Good", "price": 1, "stock": 1},
+        {"name": "", "price": -1},
+        "nope",
+    ], headers=auth_headers)
+    assert res.status_code == 400
+    assert res.get_json()["errors"] == [
+        {"index": 1, "errors": {"name": "Invalid value", "price": "Invalid value", "stock": "Missing"}},
+        {"index": 2, "errors": {"item": "Expected an object"}},
+    ]
+    assert Product.query.count() == 0
+
+    product_id = client.post("/products/bulk", json=[{"name": "A", "price": 1, "stock": 1}],
+                             headers=auth_headers).get_json()["results"][0]["id"]
+    res = client.patch("/products/bulk", json=[
+        {"id": product_id, "price": 2},
+        {"id": product_id + 100, "price": 2},
+        {"id": product_id, "stock": 3},
+    ], headers=auth_headers)
+    assert res.status_code == 400
+    assert [e["errors"]["id"] for e in res.get_json()["errors"]] == ["Product not found", "Duplicate id"]
+    assert db.session.get(Product, product_id).price == 1
+
+    test_app.config["PRODUCT_BULK_MAX_ITEMS"] = 2
+    too_many = [{"name": "X", "price": 1, "stock": 1}] * 3
+    assert client.post("/products/bulk", json=too_many, headers=auth_headers).status_code == 400
+
+
+def test_update_product_after_concurrent_stock_write(client, auth_headers):
+    product_id = client.post("/products/", json={"name": "Race", "price": 1.0, "stock": 5}, headers=auth_headers).get_json()["id"]
+    product = db.session.get(Product, product_id)
+    # A checkout bumps the version behind the loaded object's back
+    db.session.execute(update(Product.__table__).where(Product.id == product_id).values(stock=4, version=Product.version + 1))
+
+    res = client.put(f"/products/{product_id}", json={"price": 2.0}, headers=auth_headers)
+    assert res.status_code == 200
+    db.session.expire_all()
+    product = db.session.get(Product, product_id)
+    assert (product.price, product.stock, product.version) == (2.0, 4, 3)
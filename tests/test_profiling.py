@@ -0,0 +1,55 @@
+import marshal
+import os
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.models import User
+
+
+@pytest.fixture
+def tokens(test_app):
+    admin = User(username="admin", email="admin@mail.com", password="x", role="admin")
+    user = User(username="user", email="user@mail.com", password="x", role="user")
+    db.session.add_all([admin, user])
+    db.session.commit()
+    return {
+        role: {"Authorization": f"Bearer {create_access_token(identity=str(u.id), additional_claims={'role': role})}"}
+        for role, u in (("admin", admin), ("user", user))
+    }
+
+
+def test_admin_gets_a_cprofile_dump(client, tokens):
+    res = client.get("/products/", headers={**tokens["admin"], "X-Profile": "pstats"})
+    assert res.status_code == 200
+    assert res.headers["X-Profiled-Status"] == "200"
+    assert "products.list_products.prof" in res.headers["Content-Disposition"]
+    stats = marshal.loads(res.data)
+    assert any(func == "get_product_listing" for _, _, func in stats)
+
+
+def test_admin_gets_collapsed_stacks(client, test_app, tokens):
+    test_app.config["PROFILE_SAMPLE_INTERVAL"] = 0.0005
+    res = client.get("/products/?_profile=collapsed", headers=tokens["admin"])
+    assert res.status_code == 200
+    assert res.mimetype == "text/plain"
+    for line in res.get_data(as_text=True).splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert ";" in stack and int(count) > 0
+
+
+def test_profiling_is_admin_only(client, tokens):
+    assert client.get("/products/", headers={"X-Profile": "pstats"}).status_code == 401
+    assert client.get("/products/", headers={**tokens["user"], "X-Profile": "pstats"}).status_code == 403
+    assert client.get("/products/", headers={**tokens["admin"], "X-Profile": "svg"}).status_code == 400
+
+
+def test_sampled_requests_are_stored_and_rotated(client, test_app, tmp_path):
+    test_app.config.update(PROFILE_SAMPLE_EVERY=2, PROFILE_KEEP=2, PROFILE_DIR=str(tmp_path))
+    for _ in range(8):
+        res = client.get("/products/")
+        assert res.status_code == 200
+        assert res.is_json
+
+    files = sorted(os.listdir(tmp_path))
+    assert len(files) == 2
+    assert all(name.endswith("-products.list_products-%d.prof" % os.getpid()) for name in files)
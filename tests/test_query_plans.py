@@ -0,0 +1,74 @@
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.models import User
+
+
+def capture_plans(test_app, call):
+    """Run ``call`` and return the SQLite query plan of every SELECT it issued."""
+    statements = []
+
+    def capture(conn, cursor, statement, params, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, params))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+    plans = []
+    with test_app.app_context():
+        for statement, params in statements:
+            rows = db.session.connection().exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement, params
+            ).fetchall()
+            plans.append((statement, " | ".join(row[-1] for row in rows)))
+    return plans
+
+
+def plans_for(plans, table):
+    return [plan for statement, plan in plans if f"FROM {table}" in statement]
+
+
+def make_headers(test_app, role="user"):
+    with test_app.app_context():
+        user = User(username=f"plan_{role}", email=f"plan_{role}@mail.com", password="x", role=role)
+        db.session.add(user)
+        db.session.commit()
+        token = create_access_token(identity=str(user.id), additional_claims={"role": role})
+        return {"Authorization": f"Bearer {token}"}
+
+
+def test_product_listing_uses_indexes(client, test_app):
+    cases = {
+        "/products/?seller_id=1&min_price=5": "ix_products_seller_id_price",
+        "/products/?min_price=5&max_price=10&sort_by=price": "ix_products_price_id",
+        "/products/?sort_by=price&order=desc&cursor=": "ix_products_price_id",
+        "/products/?in_stock=true&sort_by=stock": "ix_products_stock",
+    }
+    for url, index in cases.items():
+        plans = plans_for(capture_plans(test_app, lambda: client.get(url)), "products")
+        assert plans, url
+        for plan in plans:
+            assert index in plan, f"{url}: {plan}"
+
+
+def test_cart_lookup_uses_user_product_index(client, test_app):
+    headers = make_headers(test_app)
+    plans = plans_for(capture_plans(test_app, lambda: client.get("/cart/", headers=headers)), "cart_items")
+
+    assert plans
+    for plan in plans:
+        assert "ux_cart_items_user_id_product_id" in plan
+
+
+def test_order_history_uses_user_created_at_index(client, test_app):
+    headers = make_headers(test_app)
+    plans = plans_for(capture_plans(test_app, lambda: client.get("/orders/me", headers=headers)), "orders")
+
+    assert plans
+    for plan in plans:
+        assert "ix_orders_user_id_created_at" in plan
+        assert "TEMP B-TREE" not in plan
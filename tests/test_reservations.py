@@ -0,0 +1,167 @@
+import time
+from datetime import datetime, timedelta
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.models import CartItem, Order, Product, StockReservation, User
+from app.services.reservation_service import ReservationSweeper, release_expired
+
+
+@pytest.fixture
+def shop(test_app):
+    test_app.config["STOCK_RESERVATIONS"] = True
+    seller = User(username="seller", email="seller@mail.com", password="x", role="seller")
+    buyers = [User(username=f"buyer{i}", email=f"buyer{i}@mail.com", password="x", role="user") for i in range(2)]
+    db.session.add_all([seller, *buyers])
+    db.session.commit()
+    product = Product(name="Limited Sneaker", price=100.0, stock=5, seller_id=seller.id)
+    db.session.add(product)
+    db.session.commit()
+    headers = [{"Authorization": f"Bearer {create_access_token(identity=str(b.id))}"} for b in buyers]
+    return product.id, headers
+
+
+def stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock
+
+
+def expire_all_holds():
+    StockReservation.query.update({"expires_at": datetime.utcnow() - timedelta(seconds=1)})
+    db.session.commit()
+
+
+def test_adding_to_cart_holds_stock(client, shop):
+    product_id, (alice, bob) = shop
+
+    assert client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=alice).status_code == 201
+    assert stock(product_id) == 2
+    assert client.get(f"/products/{product_id}").get_json()["stock"] == 2
+
+    res = client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=bob)
+    assert res.status_code == 409
+    assert CartItem.query.count() == 1
+    assert stock(product_id) == 2
+
+    assert client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=bob).status_code == 201
+    assert stock(product_id) == 0
+    assert StockReservation.query.count() == 2
+
+
+def test_cart_changes_adjust_holds(client, shop):
+    product_id, (alice, _) = shop
+    item_id = client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=alice).get_json()["item_id"]
+
+    assert client.patch(f"/cart/{item_id}/", json={"quantity": 4}, headers=alice).status_code == 200
+    assert stock(product_id) == 1
+    assert client.patch(f"/cart/{item_id}/", json={"quantity": 9}, headers=alice).status_code == 409
+    assert client.patch(f"/cart/{item_id}/", json={"quantity": 1}, headers=alice).status_code == 200
+    assert stock(product_id) == 4
+    assert StockReservation.query.one().quantity == 1
+
+    client.delete(f"/cart/{item_id}/", headers=alice)
+    assert stock(product_id) == 5
+    assert StockReservation.query.count() == 0
+
+    client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=alice)
+    client.delete("/cart/", headers=alice)
+    assert stock(product_id) == 5
+
+
+def test_checkout_converts_holds(client, shop):
+    product_id, (alice, bob) = shop
+    client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=alice)
+    assert stock(product_id) == 2
+
+    res = client.post("/orders/checkout", json={}, headers=alice)
+    assert res.status_code == 201
+    assert stock(product_id) == 2
+    assert StockReservation.query.count() == 0
+    assert Order.query.one().total_amount == 300.0
+
+    # A line larger than its hold takes the difference from the product row
+    client.post("/cart/", json={"product_id": product_id, "quantity": 1}, headers=bob)
+    CartItem.query.filter_by(product_id=product_id).one().quantity = 2
+    db.session.commit()
+    assert client.post("/orders/checkout", json={}, headers=bob).status_code == 201
+    assert stock(product_id) == 0
+
+
+def test_expired_holds_are_swept_and_released_lazily(client, test_app, shop):
+    product_id, (alice, bob) = shop
+    client.post("/cart/", json={"product_id": product_id, "quantity": 4}, headers=alice)
+    expire_all_holds()
+
+    # Bob's add first fails, hands back Alice's expired hold, then succeeds
+    assert client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=bob).status_code == 201
+    assert stock(product_id) == 2
+    assert [r.quantity for r in StockReservation.query] == [3]
+
+    expire_all_holds()
+    result = test_app.test_cli_runner().invoke(args=["release-reservations"])
+    assert "Released 1 expired reservations" in result.output
+    assert stock(product_id) == 5
+    assert release_expired() == 0
+
+
+def test_sweeper_thread_expires_holds_in_batches(client, test_app, shop):
+    product_id, (alice, bob) = shop
+    client.post("/cart/", json={"product_id": product_id, "quantity": 1}, headers=alice)
+    client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=bob)
+    expire_all_holds()
+
+    test_app.config.update(RESERVATION_SWEEP_INTERVAL=0.01, RESERVATION_SWEEP_BATCH=1)
+    sweeper = ReservationSweeper(test_app).start()
+    try:
+        deadline = time.monotonic() + 5
+        while stock(product_id) != 5 and time.monotonic() < deadline:
+            time.sleep(0.02)
+    finally:
+        sweeper.stop()
+
+    assert stock(product_id) == 5
+    assert StockReservation.query.count() == 0
+
+
+def test_explicit_stock_writes_leave_holds_out(client, shop):
+    product_id, (alice, _) = shop
+    seller_id = db.session.get(Product, product_id).seller_id
+    seller = {"Authorization": f"Bearer {create_access_token(identity=str(seller_id), additional_claims={'role': 'seller'})}"}
+    client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=alice)
+
+    # The seller restocks to 10 in total; 3 of those are still in Alice's cart
+    assert client.put(f"/products/{product_id}", json={"stock": 10}, headers=seller).status_code == 200
+    assert stock(product_id) == 7
+    assert client.patch("/products/bulk", json=[{"id": product_id, "stock": 8}], headers=seller).status_code == 200
+    assert stock(product_id) == 5
+
+    expire_all_holds()
+    release_expired()
+    assert stock(product_id) == 8
+
+
+def test_own_holds_count_as_available(client, shop):
+    product_id, (alice, _) = shop
+    client.post("/cart/", json={"product_id": product_id, "quantity": 5}, headers=alice)
+    assert stock(product_id) == 0
+
+    items = client.get("/cart/?expand=product", headers=alice).get_json()["items"]
+    assert [item["available"] for item in items] == [True]
+
+
+def test_stock_below_holds_is_rejected(client, shop):
+    product_id, (alice, _) = shop
+    seller_id = db.session.get(Product, product_id).seller_id
+    seller = {"Authorization": f"Bearer {create_access_token(identity=str(seller_id), additional_claims={'role': 'seller'})}"}
+    client.post("/cart/", json={"product_id": product_id, "quantity": 4}, headers=alice)
+
+    assert client.put(f"/products/{product_id}", json={"stock": 2}, headers=seller).status_code == 409
+    res = client.patch("/products/bulk", json=[{"id": product_id, "stock": 3}], headers=seller)
+    assert res.status_code == 400
+    assert "stock" in res.get_json()["errors"][0]["errors"]
+    assert stock(product_id) == 1
+
+    # Legacy rows that went negative are never shown as such
+    Product.query.filter_by(id=product_id).update({"stock": -2})
+    db.session.commit()
+    assert client.get(f"/products/{product_id}").get_json()["stock"] == 0
@@ -0,0 +1,170 @@
+import random
+import pytest
+from flask_jwt_extended import create_access_token, verify_jwt_in_request
+from app import db
+from app.core.search import InvertedIndex, tokenize
+from app.core.suggest import SuggestIndex
+from app.models.models import User
+from app.services.product_services import bulk_update_products
+
+
+@pytest.fixture
+def seller_headers(test_app):
+    seller = User(username="searchseller", email="search@mail.com", password="hashed", role="seller")
+    db.session.add(seller)
+    db.session.commit()
+    token = create_access_token(identity=str(seller.id), additional_claims={"role": "seller"})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def create(client, headers, name, description=None, price=5.0, stock=10):
+    res = client.post("/products/", json={
+        "name": name, "description": description, "price": price, "stock": stock
+    }, headers=headers)
+    assert res.status_code == 201
+    return res.get_json()["id"]
+
+
+def test_tokenize():
+    assert tokenize("Organic APPLES, crisp-red!") == ["organic", "apples", "crisp", "red"]
+    assert tokenize(None) == []
+
+
+def test_index_ranks_by_bm25_and_requires_all_terms():
+    index = InvertedIndex()
+    index.add(1, "green apple")
+    index.add(2, "apple apple apple pie")
+    index.add(3, "banana bread")
+
+    assert [doc_id for doc_id, _ in index.search("apple")] == [2, 1]
+    assert [doc_id for doc_id, _ in index.search("apple pie")] == [2]
+    assert index.search("apple banana") == []
+    assert index.search("") == []
+
+
+def test_index_replace_and_remove():
+    index = InvertedIndex()
+    index.add(1, "green apple")
+    index.add(1, "ripe banana")
+    assert index.search("apple") == []
+    assert [doc_id for doc_id, _ in index.search("banana")] == [1]
+
+    index.remove(1)
+    assert len(index) == 0
+    assert index.search("banana") == []
+
+
+def test_search_requires_query(client):
+    assert client.get("/products/search").status_code == 400
+    assert client.get("/products/search?q=%20").status_code == 400
+
+
+def test_search_ranks_name_and_description(client, seller_headers):
+    honey = create(client, seller_headers, "Wildflower Honey", "Raw honey from local honey bees")
+    jar = create(client, seller_headers, "Glass Jar", "Good for storing honey")
+    create(client, seller_headers, "Oat Milk", "Barista blend")
+
+    res = client.get("/products/search?q=honey")
+    assert res.status_code == 200
+    results = res.get_json()
+    assert [item["id"] for item in results] == [honey, jar]
+    assert results[0]["score"] > results[1]["score"]
+    assert set(results[0]) == {"id", "name", "price", "stock", "seller_id", "score"}
+
+
+def test_search_applies_listing_filters_and_pagination(client, seller_headers):
+    cheap = create(client, seller_headers, "Tomato Seeds", price=2.0)
+    create(client, seller_headers, "Tomato Plant", price=12.0)
+    create(client, seller_headers, "Tomato Sauce", price=3.0, stock=0)
+
+    res = client.get("/products/search?q=tomato&max_price=5&in_stock=true")
+    assert [item["id"] for item in res.get_json()] == [cheap]
+
+    first = client.get("/products/search?q=tomato&limit=2").get_json()
+    second = client.get("/products/search?q=tomato&limit=2&page=2").get_json()
+    assert len(first) == 2 and len(second) == 1
+    assert not {item["id"] for item in first} & {item["id"] for item in second}
+
+
+def test_search_follows_updates_and_deletes(client, seller_headers):
+    product_id = create(client, seller_headers, "Goat Cheese")
+    assert [item["id"] for item in client.get("/products/search?q=cheese").get_json()] == [product_id]
+
+    client.put(f"/products/{product_id}", json={"name": "Goat Yogurt"}, headers=seller_headers)
+    assert client.get("/products/search?q=cheese").get_json() == []
+    assert [item["id"] for item in client.get("/products/search?q=yogurt").get_json()] == [product_id]
+
+    client.delete(f"/products/{product_id}", headers=seller_headers)
+    assert client.get("/products/search?q=yogurt").get_json() == []
+
+
+def test_suggest_index_prefix_ranking():
+    index = SuggestIndex.build([(1, "Apple Pie", 3), (2, "apple juice", 9), (3, "Banana", 50), (4, "Apricot", 9)])
+    assert [row[0] for row in index.suggest("ap")] == [2, 4, 1]  # equal stock in name order
+    assert [row[0] for row in index.suggest("APPLE ", k=1)] == [2]
+    assert index.suggest("cherry") == []
+
+    index.add(1, "Cherry", 1)
+    index.remove(4)
+    assert [row[0] for row in index.suggest("ap")] == [2]
+    assert index.suggest("ch") == [(1, "Cherry", 1)]
+
+
+def test_suggest_index_memoized_prefixes_follow_writes():
+    rnd = random.Random(7)
+    names = ["Tea", "Tomato", "Toast", "Oat", "Tea Pot"]
+    products = {i: (f"{rnd.choice(names)} {i}", rnd.randint(0, 20)) for i in range(1, 201)}
+    index = SuggestIndex.build([(i, *row) for i, row in products.items()], max_k=5, scan_limit=10)
+    assert index.stats()["memoized_prefixes"] > 0
+
+    def expected(prefix):
+        matching = [
+            (-stock, name.lower(), i) for i, (name, stock) in products.items() if name.lower().startswith(prefix)
+        ]
+        return [i for _, _, i in sorted(matching)[:5]]
+
+    for _ in range(300):
+        product_id = rnd.randint(1, 250)
+        if rnd.random() < 0.2:
+            products.pop(product_id, None)
+            index.remove(product_id)
+        else:
+            products[product_id] = (f"{rnd.choice(names)} {product_id}", rnd.randint(0, 20))
+            index.add(product_id, *products[product_id])
+        for prefix in ("t", "te", "to", "tea p", "o"):
+            assert [row[0] for row in index.suggest(prefix, k=5)] == expected(prefix)
+
+
+def test_suggest_endpoint_follows_writes(client, seller_headers):
+    assert client.get("/products/suggest").status_code == 400
+
+    low = create(client, seller_headers, "Oat Milk", stock=2)
+    high = create(client, seller_headers, "Oat Flakes", stock=40)
+    create(client, seller_headers, "Rice", stock=99)
+
+    res = client.get("/products/suggest?prefix=oa")
+    assert res.status_code == 200
+    assert [item["id"] for item in res.get_json()] == [high, low]
+    assert client.get("/products/suggest?prefix=oa&limit=1").get_json() == [
+        {"id": high, "name": "Oat Flakes", "stock": 40}
+    ]
+
+    client.put(f"/products/{low}", json={"stock": 80}, headers=seller_headers)
+    assert [item["id"] for item in client.get("/products/suggest?prefix=oat").get_json()] == [low, high]
+
+    client.put(f"/products/{high}", json={"name": "Barley Flakes"}, headers=seller_headers)
+    client.delete(f"/products/{low}", headers=seller_headers)
+    assert client.get("/products/suggest?prefix=oat").get_json() == []
+    assert [item["id"] for item in client.get("/products/suggest?prefix=barley").get_json()] == [high]
+
+
+def test_service_writes_keep_search_current(client, test_app, seller_headers):
+    product_id = create(client, seller_headers, "Blue Cheese")
+    assert [item["id"] for item in client.get("/products/search?q=cheese").get_json()] == [product_id]
+
+    # Straight through the service, no route involved
+    with test_app.test_request_context(headers=seller_headers):
+        verify_jwt_in_request()
+        bulk_update_products([{"id": product_id, "name": "Blue Butter"}])
+    assert client.get("/products/search?q=cheese").get_json() == []
+    assert [item["id"] for item in client.get("/products/search?q=butter").get_json()] == [product_id]
@@ -0,0 +1,36 @@
+from datetime import datetime
+from app.core import json as fast_json
+from app.core.json import FastJSONProvider
+from app.models.models import Order, Product
+from app.models.serializers import order_serializer, product_serializer
+
+
+def test_row_and_object_serializers_agree():
+    product = Product(id=1, name="Apple", price=1.5, stock=3, seller_id=2)
+    row = (1, "Apple", 1.5, 3, 2)
+
+    expected = {"id": 1, "name": "Apple", "price": 1.5, "stock": 3, "seller_id": 2}
+    assert product_serializer.from_row(row) == expected
+    assert product_serializer.from_object(product) == expected
+    assert product_serializer.many([row, row]) == [expected, expected]
+
+
+def test_serializer_converters_run():
+    created = datetime(2025, 4, 18, 16, 1, 58)
+    order = Order(id=3, total_amount=9.0, status="pending", created_at=created)
+
+    payload = order_serializer.from_object(order)
+    assert payload["created_at"] == "2025-04-18T16:01:58"
+    assert order_serializer.from_row((3, 9.0, "pending", created)) == payload
+
+
+def test_provider_matches_stdlib_output(test_app, monkeypatch):
+    payload = {"b": [1, 2.5, None], "a": {"nested": "ü"}}
+    provider = FastJSONProvider(test_app)
+    fast = provider.loads(provider.dumps_bytes(payload))
+
+    monkeypatch.setattr(fast_json, "orjson", None)
+    fallback = provider.loads(provider.dumps_bytes(payload))
+
+    assert fast == fallback == payload
+    assert fast_json.decode(fast_json.encode(payload)) == payload
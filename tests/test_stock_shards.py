@@ -0,0 +1,114 @@
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy.exc import OperationalError
+from app import db
+from app.models.models import CartItem, Order, Product, ProductStockShard, User
+from app.services import stock_service
+from app.services.stock_service import take_sharded_stock
+
+
+@pytest.fixture
+def shop(test_app):
+    seller = User(username="seller", email="seller@mail.com", password="x", role="seller")
+    buyer = User(username="buyer", email="buyer@mail.com", password="x", role="user")
+    db.session.add_all([seller, buyer])
+    db.session.commit()
+    seller_headers = {"Authorization": f"Bearer {create_access_token(identity=str(seller.id), additional_claims={'role': 'seller'})}"}
+    buyer_headers = {"Authorization": f"Bearer {create_access_token(identity=str(buyer.id))}"}
+    return seller_headers, buyer_headers
+
+
+def buckets(product_id):
+    db.session.expire_all()
+    return [s.stock for s in ProductStockShard.query.filter_by(product_id=product_id).order_by(ProductStockShard.shard)]
+
+
+def stock(product_id):
+    db.session.expire_all()
+    return db.session.get(Product, product_id).stock
+
+
+def create(client, headers, **fields):
+    payload = {"name": "Drop", "price": 10.0, "stock": 10, **fields}
+    return client.post("/products/", json=payload, headers=headers)
+
+
+def test_sharded_product_spreads_stock_over_buckets(client, shop):
+    seller, _ = shop
+    product_id = create(client, seller, stock=10, stock_shards=4).get_json()["id"]
+    assert buckets(product_id) == [3, 3, 2, 2]
+    assert stock(product_id) == 10
+
+    client.put(f"/products/{product_id}", json={"stock": 7}, headers=seller)
+    assert buckets(product_id) == [2, 2, 2, 1]
+
+    client.put(f"/products/{product_id}", json={"stock_shards": 0}, headers=seller)
+    assert buckets(product_id) == []
+    assert stock(product_id) == 7
+
+    assert create(client, seller, stock_shards=1000).status_code == 400
+
+
+def test_checkout_takes_from_buckets_and_rolls_up_total(client, shop):
+    seller, buyer = shop
+    product_id = create(client, seller, stock=6, stock_shards=3).get_json()["id"]
+
+    client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=buyer)
+    assert client.post("/orders/checkout", json={}, headers=buyer).status_code == 201
+    assert sum(buckets(product_id)) == 4
+    assert stock(product_id) == 4
+
+    # Three units only fit across buckets, never in a single one
+    client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=buyer)
+    assert client.post("/orders/checkout", json={}, headers=buyer).status_code == 201
+    assert sum(buckets(product_id)) == 1
+    assert stock(product_id) == 1
+
+    client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=buyer)
+    res = client.post("/orders/checkout", json={}, headers=buyer)
+    assert res.status_code == 400
+    assert sum(buckets(product_id)) == 1
+    assert CartItem.query.count() == 1
+
+
+def test_take_sharded_stock_never_oversells(client, shop):
+    seller, _ = shop
+    product_id = create(client, seller, stock=5, stock_shards=4).get_json()["id"]
+
+    taken = sum(1 for _ in range(8) if take_sharded_stock(product_id, 4, 1))
+    assert taken == 5
+    assert buckets(product_id) == [0, 0, 0, 0]
+
+
+def test_reservations_hold_sharded_stock(client, test_app, shop):
+    test_app.config["STOCK_RESERVATIONS"] = True
+    seller, buyer = shop
+    product_id = create(client, seller, stock=4, stock_shards=2).get_json()["id"]
+
+    item_id = client.post("/cart/", json={"product_id": product_id, "quantity": 3}, headers=buyer).get_json()["item_id"]
+    assert sum(buckets(product_id)) == 1
+    assert stock(product_id) == 1
+    assert client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=buyer).status_code == 409
+
+    client.delete(f"/cart/{item_id}/", headers=buyer)
+    assert sum(buckets(product_id)) == 4
+    assert stock(product_id) == 4
+
+
+def test_failed_rollup_does_not_fail_the_sale(client, shop, monkeypatch):
+    seller, buyer = shop
+    product_id = create(client, seller, stock=6, stock_shards=3).get_json()["id"]
+
+    def deadlock(product_ids):
+        raise OperationalError("UPDATE products", {}, Exception("deadlock detected"))
+
+    monkeypatch.setattr(stock_service, "_roll_up", deadlock)
+    client.post("/cart/", json={"product_id": product_id, "quantity": 2}, headers=buyer)
+    assert client.post("/orders/checkout", json={}, headers=buyer).status_code == 201
+    assert Order.query.count() == 1
+    assert sum(buckets(product_id)) == 4
+
+    # The next successful rollup catches the total up
+    monkeypatch.undo()
+    stock_service.refresh_stock_totals([product_id])
+    assert stock(product_id) == 4